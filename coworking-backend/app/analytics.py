@@ -0,0 +1,167 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from datetime import datetime, timedelta, date
+from collections import defaultdict
+from . import models
+
+# Аналитика дашборда читает агрегаты daily_stats / user_daily_stats,
+# которые crud обновляет в той же транзакции, что и исходные события.
+# Каждая серия - один запрос по диапазону дней, O(days) строк.
+
+ROLLUP_FIELDS = (
+    "visits_count", "timed_visits_count", "visit_minutes",
+    "bookings_count", "donations_count", "donations_amount"
+)
+
+def _as_date(value):
+    # SQLite возвращает date() строкой, PostgreSQL - объектом date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _month_bucket(db: Session, column):
+    if db.bind.dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+def _month_starts(today: date, months: int):
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return starts
+
+def _daily_series(db: Session, column, days: int, today: date):
+    first_day = today - timedelta(days=days - 1)
+    rows = db.query(models.DailyStats.day, column).filter(
+        models.DailyStats.day >= first_day,
+        models.DailyStats.day <= today
+    ).all()
+    values = {day: value for day, value in rows}
+    return {
+        (today - timedelta(days=i)).isoformat(): values.get(today - timedelta(days=i), 0) or 0
+        for i in range(days)
+    }
+
+def get_daily_active_users(db: Session, days: int = 30, today: date = None):
+    """DAU за последние `days` дней"""
+    today = today or datetime.utcnow().date()
+    return _daily_series(db, models.DailyStats.active_users, days, today)
+
+def get_monthly_active_users(db: Session, months: int = 12, today: date = None):
+    """MAU за последние `months` календарных месяцев одним запросом"""
+    today = today or datetime.utcnow().date()
+    starts = _month_starts(today, months)
+    month = _month_bucket(db, models.UserDailyStats.day)
+
+    rows = db.query(month, func.count(models.UserDailyStats.user_id.distinct())).filter(
+        models.UserDailyStats.day >= starts[-1],
+        models.UserDailyStats.visits_count > 0
+    ).group_by(month).all()
+    counts = dict(rows)
+
+    return {start.strftime("%Y-%m"): counts.get(start.strftime("%Y-%m"), 0) for start in starts}
+
+def get_donations_stats(db: Session, days: int = 30):
+    """Сводка и дневная серия пожертвований за последние `days` дней"""
+    today = datetime.utcnow().date()
+
+    total_amount, donation_count = db.query(
+        func.coalesce(func.sum(models.DailyStats.donations_amount), 0),
+        func.coalesce(func.sum(models.DailyStats.donations_count), 0)
+    ).filter(
+        models.DailyStats.day > today - timedelta(days=days),
+        models.DailyStats.day <= today
+    ).one()
+
+    avg_donation = total_amount / donation_count if donation_count > 0 else 0
+
+    daily_stats = _daily_series(db, models.DailyStats.donations_amount, days, today)
+
+    return {
+        "total_amount": float(total_amount),
+        "donation_count": donation_count,
+        "average_donation": float(avg_donation),
+        "daily_stats": {day: float(amount) for day, amount in daily_stats.items()}
+    }
+
+def get_dashboard_stats(db: Session):
+    """Полная статистика для админ-дашборда (схема DashboardStats)"""
+    today = datetime.utcnow().date()
+
+    total_users = db.query(func.count(models.User.id)).scalar() or 0
+
+    total_visits, timed_visits, visit_minutes, total_donations = db.query(
+        func.coalesce(func.sum(models.DailyStats.visits_count), 0),
+        func.coalesce(func.sum(models.DailyStats.timed_visits_count), 0),
+        func.coalesce(func.sum(models.DailyStats.visit_minutes), 0),
+        func.coalesce(func.sum(models.DailyStats.donations_amount), 0)
+    ).one()
+    avg_duration = visit_minutes / timed_visits if timed_visits else 0
+
+    daily_active_users = get_daily_active_users(db, 30, today)
+    monthly_active_users = get_monthly_active_users(db, 12, today)
+
+    return {
+        "total_users": total_users,
+        "active_users_today": daily_active_users[today.isoformat()],
+        "total_visits": total_visits,
+        "total_donations": float(total_donations),
+        "average_visit_duration": float(avg_duration),
+        "daily_active_users": daily_active_users,
+        "monthly_active_users": monthly_active_users,
+        "donation_stats": get_donations_stats(db, 30)
+    }
+
+def rebuild_rollups(db: Session):
+    """Пересчитывает daily_stats и user_daily_stats из visits, bookings и donations"""
+    user_days = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+
+    visit_day = func.date(models.Visit.check_in)
+    timed = models.Visit.duration_minutes > 0
+    for user_id, day, visits, timed_visits, minutes in db.query(
+        models.Visit.user_id, visit_day,
+        func.count(models.Visit.id),
+        func.sum(case((timed, 1), else_=0)),
+        func.sum(case((timed, models.Visit.duration_minutes), else_=0))
+    ).group_by(models.Visit.user_id, visit_day):
+        row = user_days[(user_id, _as_date(day))]
+        row["visits_count"] = visits
+        row["timed_visits_count"] = timed_visits or 0
+        row["visit_minutes"] = minutes or 0
+
+    booking_day = func.date(models.Booking.start_time)
+    for user_id, day, bookings in db.query(
+        models.Booking.user_id, booking_day, func.count(models.Booking.id)
+    ).group_by(models.Booking.user_id, booking_day):
+        user_days[(user_id, _as_date(day))]["bookings_count"] = bookings
+
+    donation_day = func.date(models.Donation.donation_date)
+    for user_id, day, donations, amount in db.query(
+        models.Donation.user_id, donation_day,
+        func.count(models.Donation.id), func.sum(models.Donation.amount)
+    ).group_by(models.Donation.user_id, donation_day):
+        row = user_days[(user_id, _as_date(day))]
+        row["donations_count"] = donations
+        row["donations_amount"] = amount or 0.0
+
+    days = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS + ("active_users",), 0))
+    for (user_id, day), row in user_days.items():
+        totals = days[day]
+        for field in ROLLUP_FIELDS:
+            totals[field] += row[field]
+        if row["visits_count"]:
+            totals["active_users"] += 1
+
+    db.query(models.UserDailyStats).delete()
+    db.query(models.DailyStats).delete()
+    db.bulk_insert_mappings(models.UserDailyStats, [
+        {"user_id": user_id, "day": day, **row} for (user_id, day), row in user_days.items()
+    ])
+    db.bulk_insert_mappings(models.DailyStats, [
+        {"day": day, **totals} for day, totals in days.items()
+    ])
+    db.commit()
+
+    return {"days": len(days), "user_days": len(user_days)}
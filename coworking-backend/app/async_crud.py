@@ -0,0 +1,156 @@
+"""
+Асинхронные версии операций из crud.py для AsyncSession.
+
+Каждая функция выполняет соответствующую функцию crud через
+AsyncSession.run_sync: SQL-логика остается в одном месте, а ввод-вывод идет
+через асинхронный драйвер (aiosqlite / asyncpg) без занятия потока из пула.
+
+Изменяющие операции идут через run_write: при WRITE_QUEUE_ENABLED=1 их
+выполняет поток-писатель (utils/write_queue.py), иначе - эта же сессия.
+get_room, get_rooms, get_user и get_user_by_email читают через кэш
+(utils/read_cache.py) и возвращают снимки схем, а не ORM-объекты.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, date
+from typing import List
+from . import crud, schemas
+from .utils.pagination import PageParams
+from .utils.password_hashing import password_hasher
+from .utils.write_queue import run_write
+from .utils.read_cache import read_cache
+
+# User operations
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await read_cache.get_user_by_email(
+        email,
+        lambda user_id: db.run_sync(crud.get_user, user_id),
+        lambda: db.run_sync(crud.get_user_by_email, email)
+    )
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # bcrypt нагружает CPU, поэтому хешируем в пуле процессов
+    hashed_password = await password_hasher.hash(user.password)
+    return await run_write(db, crud.create_user, user, hashed_password)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    # Нужен hashed_password, которого нет в снимке кэша
+    user = await db.run_sync(crud.get_user_by_email, email)
+    if not user:
+        return False
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
+        return False
+    if new_hash:
+        await run_write(db, crud.update_password_hash, user.id, new_hash)
+    return user
+
+async def get_users(db: AsyncSession, page: PageParams = None):
+    return await db.run_sync(crud.get_users, page)
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await read_cache.get_user(user_id, lambda: db.run_sync(crud.get_user, user_id))
+
+# Visit operations
+async def create_visit(db: AsyncSession, visit: schemas.VisitCreate):
+    return await run_write(db, crud.create_visit, visit)
+
+async def get_visits(db: AsyncSession, page: PageParams = None):
+    return await db.run_sync(crud.get_visits, page)
+
+async def get_user_visits(db: AsyncSession, user_id: int, page: PageParams = None):
+    return await db.run_sync(crud.get_user_visits, user_id, page)
+
+async def get_open_visit(db: AsyncSession, user_id: int):
+    return await db.run_sync(crud.get_open_visit, user_id)
+
+async def check_out_visit(db: AsyncSession, visit_id: int):
+    return await run_write(db, crud.check_out_visit, visit_id)
+
+# Donation operations
+async def create_donation(db: AsyncSession, donation: schemas.DonationCreate):
+    return await run_write(db, crud.create_donation, donation)
+
+async def get_donations(db: AsyncSession, page: PageParams = None):
+    return await db.run_sync(crud.get_donations, page)
+
+async def get_user_donations(db: AsyncSession, user_id: int, page: PageParams = None):
+    return await db.run_sync(crud.get_user_donations, user_id, page)
+
+async def get_recent_donations(db: AsyncSession, limit: int = 10):
+    return await db.run_sync(crud.get_recent_donations, limit)
+
+# Statistics
+async def get_donations_stats(db: AsyncSession, days: int = 30):
+    return await db.run_sync(crud.get_donations_stats, days)
+
+async def get_dashboard_stats(db: AsyncSession):
+    return await db.run_sync(crud.get_dashboard_stats)
+
+async def get_user_statistics(db: AsyncSession, user_id: int):
+    return await db.run_sync(crud.get_user_statistics, user_id)
+
+# Room operations
+async def create_room(db: AsyncSession, room: schemas.RoomCreate):
+    return await run_write(db, crud.create_room, room)
+
+async def get_rooms(db: AsyncSession, skip: int = 0, limit: int = 100, active_only: bool = True,
+                    version: int = None):
+    return await read_cache.get_rooms(
+        skip, limit, active_only, lambda: db.run_sync(crud.get_rooms, skip, limit, active_only), version
+    )
+
+async def get_room(db: AsyncSession, room_id: int, version: int = None):
+    return await read_cache.get_room(room_id, lambda: db.run_sync(crud.get_room, room_id), version)
+
+async def get_room_by_name(db: AsyncSession, name: str):
+    return await db.run_sync(crud.get_room_by_name, name)
+
+async def get_resource_version(db: AsyncSession, name: str):
+    return await db.run_sync(crud.get_resource_version, name)
+
+async def update_room(db: AsyncSession, room_id: int, room_update: schemas.RoomUpdate):
+    return await run_write(db, crud.update_room, room_id, room_update)
+
+async def delete_room(db: AsyncSession, room_id: int):
+    return await run_write(db, crud.delete_room, room_id)
+
+# Booking operations
+async def create_booking(db: AsyncSession, booking: schemas.BookingCreate, user_id: int):
+    return await run_write(db, crud.create_booking, booking, user_id)
+
+async def create_bookings_bulk(db: AsyncSession, bulk: schemas.BookingBulkCreate, user_id: int,
+                               max_created: int = None):
+    return await run_write(db, crud.create_bookings_bulk, bulk, user_id, max_created)
+
+async def get_bookings(db: AsyncSession, page: PageParams = None):
+    return await db.run_sync(crud.get_bookings, page)
+
+async def get_user_bookings(db: AsyncSession, user_id: int, page: PageParams = None):
+    return await db.run_sync(crud.get_user_bookings, user_id, page)
+
+async def get_room_bookings(db: AsyncSession, room_id: int, start_date: datetime = None, end_date: datetime = None,
+                            page: PageParams = None):
+    return await db.run_sync(crud.get_room_bookings, room_id, start_date, end_date, page)
+
+async def get_booking(db: AsyncSession, booking_id: int):
+    # user и room загружаются тем же запросом (crud.booking_read_query),
+    # поэтому BookingResponse строится без ленивой загрузки вне run_sync
+    return await db.run_sync(crud.get_booking, booking_id)
+
+async def update_booking(db: AsyncSession, booking_id: int, booking_update: schemas.BookingUpdate):
+    return await run_write(db, crud.update_booking, booking_id, booking_update)
+
+async def cancel_booking(db: AsyncSession, booking_id: int):
+    return await run_write(db, crud.cancel_booking, booking_id)
+
+async def get_room_availability(db: AsyncSession, room_id: int, date: datetime,
+                                slot_minutes: int = 60, min_duration: int = None):
+    return await db.run_sync(crud.get_room_availability, room_id, date, slot_minutes, min_duration)
+
+async def get_availability_matrix(db: AsyncSession, start_date: date, days: int = 1,
+                                  min_capacity: int = None, equipment: List[str] = None,
+                                  slot_minutes: int = 60):
+    return await db.run_sync(
+        crud.get_availability_matrix, start_date, days, min_capacity, equipment, slot_minutes
+    )
@@ -1,15 +1,29 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from . import models, schemas
-from .utils.security import get_password_hash, verify_password
-from datetime import datetime, timedelta
+from . import analytics
+from .utils.security import get_password_hash
+from .utils.password_hashing import verify_and_update
+from .utils.booking_index import booking_index
+from .utils.booking_events import booking_events
+from .utils.occupancy import occupancy
+from .utils.read_cache import read_cache
+from .utils.principal_cache import mark_user_changed
+from .utils.write_queue import after_commit
+from .utils import availability
+from .utils.permissions import validate_booking_time
+from .utils.pagination import PageParams, keyset_page
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta, date
 from typing import List, Optional
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, text, update
+from sqlalchemy.exc import IntegrityError
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    hashed_password = hashed_password or get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -22,37 +36,151 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
+        return False
+    verified, new_hash = verify_and_update(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        update_password_hash(db, user.id, new_hash)
     return user
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Stores a hash recomputed with the current bcrypt cost"""
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.hashed_password: hashed_password},
+        synchronize_session=False
+    )
+    db.commit()
+
+def get_users(db: Session, page: PageParams = None):
+    return keyset_page(
+        db.query(models.User), models.User.id, models.User.id,
+        page or PageParams(), descending=False
+    )
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def update_user_karma(db: Session, user_id: int, karma_delta: int):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+def update_user_karma(db: Session, user_id: int, karma_delta: int, reason: str = "adjustment"):
+    """Manual karma change, committed immediately"""
+    record_karma(db, user_id, karma_delta, reason)
+    db.commit()
+    user = get_user(db, user_id)
     if user:
-        user.karma += karma_delta
-        db.commit()
+        # UPDATE шел мимо identity map: при expire_on_commit=False karma устарела
         db.refresh(user)
     return user
 
+# Karma ledger: every change is a karma_events row written in the caller's
+# transaction together with an atomic users.karma increment.
+def record_karma(db: Session, user_id: int, karma_delta: int, reason: str, source_id: int = None):
+    db.add(models.KarmaEvent(user_id=user_id, delta=karma_delta, reason=reason, source_id=source_id))
+    add_user_karma(db, user_id, karma_delta)
+
+def add_user_karma(db: Session, user_id: int, karma_delta: int):
+    """Atomic karma increment inside the caller's transaction"""
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.karma: models.User.karma + karma_delta},
+        synchronize_session=False
+    )
+    mark_user_changed(db, user_id)
+
+def reconcile_karma(db: Session, fix: bool = True):
+    """Compares users.karma with the ledger sums and optionally corrects drift"""
+    ledger = db.query(
+        models.KarmaEvent.user_id, func.sum(models.KarmaEvent.delta).label("karma")
+    ).group_by(models.KarmaEvent.user_id).subquery()
+    expected = func.coalesce(ledger.c.karma, 0)
+    
+    mismatches = db.query(models.User.id, models.User.karma, expected).outerjoin(
+        ledger, ledger.c.user_id == models.User.id
+    ).filter(func.coalesce(models.User.karma, 0) != expected).all()
+    
+    if fix:
+        for user_id, _, karma in mismatches:
+            db.query(models.User).filter(models.User.id == user_id).update(
+                {models.User.karma: karma}, synchronize_session=False
+            )
+            mark_user_changed(db, user_id)
+        db.commit()
+    
+    return {
+        "users": db.query(func.count(models.User.id)).scalar(),
+        "mismatches": [
+            {"user_id": user_id, "karma": karma, "ledger": expected_karma}
+            for user_id, karma, expected_karma in mismatches
+        ],
+        "fixed": len(mismatches) if fix else 0
+    }
+
+def flush_visits(db: Session):
+    # Уникальный частичный индекс ix_visits_open_user: второе открытое
+    # посещение пользователя (check-in в другом процессе) не вставится
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("User is already checked in")
+
 def create_visit(db: Session, visit: schemas.VisitCreate):
     db_visit = models.Visit(**visit.dict())
     db.add(db_visit)
+    flush_visits(db)
+    record_karma(db, visit.user_id, 1, "visit", db_visit.id)
+    
+    user_visits = bump_user_daily_stats(
+        db, visit.user_id, db_visit.check_in.date(), visits_count=1
+    )
+    bump_daily_stats(
+        db, db_visit.check_in.date(),
+        visits_count=1, active_users=1 if user_visits == 1 else 0
+    )
     db.commit()
     db.refresh(db_visit)
-    update_user_karma(db, visit.user_id, 1)
+    after_commit(occupancy.checked_in, db_visit)
     return db_visit
 
-def get_visits(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Visit).offset(skip).limit(limit).all()
+def create_visits_batch(db: Session, visits: List[schemas.VisitCreate]):
+    """Inserts several check-ins with their karma and rollups in one transaction"""
+    db_visits = [models.Visit(**visit.dict()) for visit in visits]
+    db.add_all(db_visits)
+    flush_visits(db)
+
+    db.add_all([
+        models.KarmaEvent(user_id=v.user_id, delta=1, reason="visit", source_id=v.id)
+        for v in db_visits
+    ])
+    per_user_day = Counter((v.user_id, v.check_in.date()) for v in db_visits)
+    for user_id, count in Counter(v.user_id for v in db_visits).items():
+        add_user_karma(db, user_id, count)
+    for (user_id, day), count in per_user_day.items():
+        user_visits = bump_user_daily_stats(db, user_id, day, visits_count=count)
+        bump_daily_stats(
+            db, day, visits_count=count, active_users=1 if user_visits == count else 0
+        )
+    db.commit()
+    for db_visit in db_visits:
+        after_commit(occupancy.checked_in, db_visit)
+    return db_visits
+
+def get_visits(db: Session, page: PageParams = None):
+    return keyset_page(
+        db.query(models.Visit), models.Visit.check_in, models.Visit.id, page or PageParams()
+    )
 
-def get_user_visits(db: Session, user_id: int):
-    return db.query(models.Visit).filter(models.Visit.user_id == user_id).all()
+def get_user_visits(db: Session, user_id: int, page: PageParams = None):
+    return keyset_page(
+        db.query(models.Visit).filter(models.Visit.user_id == user_id),
+        models.Visit.check_in, models.Visit.id, page or PageParams()
+    )
+
+def get_open_visit(db: Session, user_id: int):
+    """The user's latest visit without check-out (partial index ix_visits_open_user)"""
+    return db.query(models.Visit).filter(
+        models.Visit.user_id == user_id,
+        models.Visit.check_out.is_(None)
+    ).order_by(models.Visit.check_in.desc()).first()
 
 def check_out_visit(db: Session, visit_id: int):
     visit = db.query(models.Visit).filter(models.Visit.id == visit_id).first()
@@ -60,34 +188,85 @@ def check_out_visit(db: Session, visit_id: int):
         visit.check_out = datetime.utcnow()
         duration = (visit.check_out - visit.check_in).total_seconds() / 60
         visit.duration_minutes = int(duration)
+        if visit.duration_minutes > 0:
+            day = visit.check_in.date()
+            deltas = {"timed_visits_count": 1, "visit_minutes": visit.duration_minutes}
+            bump_user_daily_stats(db, visit.user_id, day, **deltas)
+            bump_daily_stats(db, day, **deltas)
         db.commit()
         db.refresh(visit)
+        after_commit(occupancy.checked_out, visit)
     return visit
 
+def close_stale_visits(db: Session, opened_before: datetime, batch_size: int = 500):
+    """Closes visits left open since before `opened_before`, one bounded UPDATE per batch
+
+    Auto-closed visits get duration_minutes = 0, so like untimed visits they
+    do not count towards the average visit duration.
+    """
+    closed = 0
+    while True:
+        batch = close_stale_visits_batch(db, opened_before, batch_size)
+        closed += batch
+        if batch < batch_size:
+            return closed
+
+def close_stale_visits_batch(db: Session, opened_before: datetime, batch_size: int = 500):
+    """One batch of close_stale_visits in its own commit; returns the number of closed visits"""
+    rows = db.query(models.Visit.id, models.Visit.user_id).filter(
+        models.Visit.check_out.is_(None),
+        models.Visit.check_in < opened_before
+    ).limit(batch_size).all()
+    if not rows:
+        return 0
+    db.query(models.Visit).filter(
+        models.Visit.id.in_([visit_id for visit_id, _ in rows]),
+        models.Visit.check_out.is_(None)
+    ).update(
+        {models.Visit.check_out: datetime.utcnow(), models.Visit.duration_minutes: 0},
+        synchronize_session=False
+    )
+    db.commit()
+    for visit_id, user_id in rows:
+        after_commit(occupancy.remove, user_id, visit_id)
+    return len(rows)
+
 def create_donation(db: Session, donation: schemas.DonationCreate):
     db_donation = models.Donation(**donation.dict())
     db.add(db_donation)
-    db.commit()
-    db.refresh(db_donation)
+    db.flush()
+    
+    day = db_donation.donation_date.date()
+    deltas = {"donations_count": 1, "donations_amount": donation.amount}
+    bump_user_daily_stats(db, donation.user_id, day, **deltas)
+    bump_daily_stats(db, day, **deltas)
     
     karma_points = int(donation.amount / 50)
     if karma_points > 0:
-        update_user_karma(db, donation.user_id, karma_points)
+        record_karma(db, donation.user_id, karma_points, "donation", db_donation.id)
     
-    user = db.query(models.User).filter(models.User.id == donation.user_id).first()
-    if user:
-        user.total_donated += donation.amount
-        db.commit()
+    db.query(models.User).filter(models.User.id == donation.user_id).update(
+        {models.User.total_donated: models.User.total_donated + donation.amount},
+        synchronize_session=False
+    )
+    mark_user_changed(db, donation.user_id)
+    bump_resource_version(db, "donations")
     
+    db.commit()
+    db.refresh(db_donation)
     return db_donation
 
-def get_donations(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Donation).order_by(models.Donation.donation_date.desc()).offset(skip).limit(limit).all()
+def get_donations(db: Session, page: PageParams = None):
+    return keyset_page(
+        db.query(models.Donation), models.Donation.donation_date, models.Donation.id,
+        page or PageParams()
+    )
 
-def get_user_donations(db: Session, user_id: int):
-    return db.query(models.Donation).filter(
-        models.Donation.user_id == user_id
-    ).order_by(models.Donation.donation_date.desc()).all()
+def get_user_donations(db: Session, user_id: int, page: PageParams = None):
+    return keyset_page(
+        db.query(models.Donation).filter(models.Donation.user_id == user_id),
+        models.Donation.donation_date, models.Donation.id, page or PageParams()
+    )
 
 def get_recent_donations(db: Session, limit: int = 10):
     return db.query(models.Donation).order_by(
@@ -95,98 +274,24 @@ def get_recent_donations(db: Session, limit: int = 10):
     ).limit(limit).all()
 
 def get_donations_stats(db: Session, days: int = 30):
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    total_amount = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).filter(
-        models.Donation.donation_date >= start_date
-    ).scalar() or 0
-    
-    donation_count = db.query(func.count(models.Donation.id)).filter(
-        models.Donation.donation_date >= start_date
-    ).scalar() or 0
-    
-    avg_donation = total_amount / donation_count if donation_count > 0 else 0
-    
-    daily_stats = {}
-    for i in range(days):
-        day = datetime.utcnow().date() - timedelta(days=i)
-        day_amount = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).filter(
-            func.date(models.Donation.donation_date) == day
-        ).scalar() or 0
-        daily_stats[day.isoformat()] = float(day_amount)
-    
-    return {
-        "total_amount": float(total_amount),
-        "donation_count": donation_count,
-        "average_donation": float(avg_donation),
-        "daily_stats": daily_stats
-    }
+    return analytics.get_donations_stats(db, days=days)
 
 def get_dashboard_stats(db: Session):
-    total_users = db.query(func.count(models.User.id)).scalar() or 0
-    today = datetime.utcnow().date()
-    
-    active_users_today = db.query(func.count(models.Visit.user_id.distinct())).filter(
-        func.date(models.Visit.check_in) == today
-    ).scalar() or 0
-    
-    total_visits = db.query(func.count(models.Visit.id)).scalar() or 0
-    total_donations = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).scalar() or 0
-    
-    avg_duration = db.query(func.avg(models.Visit.duration_minutes)).filter(
-        models.Visit.duration_minutes > 0
-    ).scalar() or 0
-    
-    daily_active_users = {}
-    for i in range(30):
-        day = today - timedelta(days=i)
-        dau = db.query(func.count(models.Visit.user_id.distinct())).filter(
-            func.date(models.Visit.check_in) == day
-        ).scalar() or 0
-        daily_active_users[day.isoformat()] = dau
-    
-    monthly_active_users = {}
-    for i in range(12):
-        month_start = today.replace(day=1) - timedelta(days=30*i)
-        month_end = (month_start + timedelta(days=32)).replace(day=1)
-        mau = db.query(func.count(models.Visit.user_id.distinct())).filter(
-            and_(
-                models.Visit.check_in >= month_start,
-                models.Visit.check_in < month_end
-            )
-        ).scalar() or 0
-        monthly_active_users[month_start.strftime("%Y-%m")] = mau
-    
-    donation_stats = get_donations_stats(db, 30)
-    
-    return {
-        "total_users": total_users,
-        "active_users_today": active_users_today,
-        "total_visits": total_visits,
-        "total_donations": float(total_donations),
-        "average_visit_duration": float(avg_duration),
-        "daily_active_users": daily_active_users,
-        "monthly_active_users": monthly_active_users,
-        "donation_stats": donation_stats
-    }
+    return analytics.get_dashboard_stats(db)
 
 def get_user_statistics(db: Session, user_id: int):
     user = get_user(db, user_id)
     if not user:
         return None
     
-    total_visits = db.query(func.count(models.Visit.id)).filter(
-        models.Visit.user_id == user_id
-    ).scalar() or 0
-    
-    total_donation = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).filter(
-        models.Donation.user_id == user_id
-    ).scalar() or 0
+    total_visits, timed_visits, visit_minutes, total_donation = db.query(
+        func.coalesce(func.sum(models.UserDailyStats.visits_count), 0),
+        func.coalesce(func.sum(models.UserDailyStats.timed_visits_count), 0),
+        func.coalesce(func.sum(models.UserDailyStats.visit_minutes), 0),
+        func.coalesce(func.sum(models.UserDailyStats.donations_amount), 0)
+    ).filter(models.UserDailyStats.user_id == user_id).one()
     
-    avg_duration = db.query(func.avg(models.Visit.duration_minutes)).filter(
-        models.Visit.user_id == user_id,
-        models.Visit.duration_minutes > 0
-    ).scalar() or 0
+    avg_duration = visit_minutes / timed_visits if timed_visits else 0
     
     last_visit = db.query(models.Visit).filter(
         models.Visit.user_id == user_id
@@ -200,12 +305,58 @@ def get_user_statistics(db: Session, user_id: int):
         "last_visit": last_visit.check_in if last_visit else None
     }
 
+# Rollup operations
+def _upsert_increment(db: Session, model, keys: dict, deltas: dict, returning=None,
+                      values: dict = None):
+    """INSERT ... ON CONFLICT DO UPDATE SET col = col + delta (and col = value for `values`)"""
+    values = values or {}
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    stmt = insert(model).values(**keys, **deltas, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={**{field: getattr(model, field) + value for field, value in deltas.items()}, **values}
+    )
+    if returning is not None:
+        return db.execute(stmt.returning(returning)).scalar()
+    db.execute(stmt)
+
+def bump_resource_version(db: Session, name: str):
+    """New ETag / Last-Modified for `name`, committed with the caller's change"""
+    _upsert_increment(
+        db, models.ResourceVersion, {"name": name}, {"version": 1},
+        values={"updated_at": datetime.utcnow()}
+    )
+
+def get_resource_version(db: Session, name: str):
+    """(version, updated_at) or None before the first change"""
+    return db.query(models.ResourceVersion.version, models.ResourceVersion.updated_at).filter(
+        models.ResourceVersion.name == name
+    ).first()
+
+def bump_daily_stats(db: Session, day, **deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if deltas:
+        _upsert_increment(db, models.DailyStats, {"day": day}, deltas)
+
+def bump_user_daily_stats(db: Session, user_id: int, day, **deltas):
+    """Returns the user's visits_count for the day after the update"""
+    return _upsert_increment(
+        db, models.UserDailyStats, {"user_id": user_id, "day": day}, deltas,
+        returning=models.UserDailyStats.visits_count
+    )
+
 # Room CRUD operations
 def create_room(db: Session, room: schemas.RoomCreate):
     db_room = models.Room(**room.dict())
     db.add(db_room)
+    bump_resource_version(db, "rooms")
     db.commit()
     db.refresh(db_room)
+    after_commit(read_cache.invalidate_room)
     return db_room
 
 def get_rooms(db: Session, skip: int = 0, limit: int = 100, active_only: bool = True):
@@ -226,124 +377,426 @@ def update_room(db: Session, room_id: int, room_update: schemas.RoomUpdate):
         update_data = room_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_room, field, value)
+        bump_resource_version(db, "rooms")
         db.commit()
         db.refresh(db_room)
+        after_commit(read_cache.invalidate_room, room_id)
     return db_room
 
 def delete_room(db: Session, room_id: int):
     db_room = db.query(models.Room).filter(models.Room.id == room_id).first()
     if db_room:
         db_room.is_active = False
+        bump_resource_version(db, "rooms")
         db.commit()
         db.refresh(db_room)
+        after_commit(read_cache.invalidate_room, room_id)
     return db_room
 
 # Booking CRUD operations
-def create_booking(db: Session, booking: schemas.BookingCreate, user_id: int):
-    # Check for conflicts
-    conflicting_booking = db.query(models.Booking).filter(
-        models.Booking.room_id == booking.room_id,
+def get_conflicting_booking(db: Session, room_id: int, start_time: datetime, end_time: datetime,
+                            exclude_id: int = None):
+    query = db.query(models.Booking).filter(
+        models.Booking.room_id == room_id,
         models.Booking.status == "confirmed",
-        or_(
-            and_(
-                models.Booking.start_time < booking.end_time,
-                models.Booking.end_time > booking.start_time
+        models.Booking.start_time < end_time,
+        models.Booking.end_time > start_time
+    )
+    if exclude_id is not None:
+        query = query.filter(models.Booking.id != exclude_id)
+    return query.first()
+
+def lock_room_bookings(db: Session, room_id: int):
+    """Serialize booking writes for a room until the current transaction ends"""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": room_id})
+    elif dialect == "sqlite":
+        connection = db.connection()
+        if not connection.connection.driver_connection.in_transaction:
+            # Берем блокировку записи до проверки конфликтов
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            # Транзакция уже начата записью: поднимаем ее до RESERVED
+            db.execute(
+                update(models.Room).where(models.Room.id == room_id).values(id=models.Room.id)
             )
-        )
-    ).first()
+
+def check_booking_conflict(db: Session, room_id: int, start_time: datetime, end_time: datetime,
+                           exclude_id: int = None):
+    """Raises ValueError if the room is taken; locks the room for the rest of the transaction"""
+    # Индекс в памяти - только подсказка: бронирование могли отменить или
+    # перенести в другом процессе, поэтому решение принимает запрос к базе
+    hinted = booking_index.covers(start_time) and booking_index.find_conflict(
+        room_id, start_time, end_time, exclude_id
+    ) is not None
     
-    if conflicting_booking:
+    lock_room_bookings(db, room_id)
+    conflict = get_conflicting_booking(db, room_id, start_time, end_time, exclude_id) is not None
+    if booking_index.loaded and conflict != hinted:
+        # Индекс разошелся с базой: изменение сделал другой процесс
+        booking_index.reload_room(db, room_id)
+    if conflict:
+        raise ValueError("Room is already booked for this time period")
+
+def commit_booking(db: Session, flush_only: bool = False):
+    # На PostgreSQL пересечения дополнительно запрещены ограничением EXCLUDE;
+    # оно срабатывает уже на flush, поэтому flush идет через этот же обработчик
+    try:
+        if flush_only:
+            db.flush()
+        else:
+            db.commit()
+    except IntegrityError:
+        db.rollback()
         raise ValueError("Room is already booked for this time period")
+
+def create_booking(db: Session, booking: schemas.BookingCreate, user_id: int):
+    # Conflict check, insert, rollups and karma share one transaction
+    check_booking_conflict(db, booking.room_id, booking.start_time, booking.end_time)
     
     db_booking = models.Booking(
         **booking.dict(),
         user_id=user_id
     )
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    
+    day = booking.start_time.date()
+    bump_user_daily_stats(db, user_id, day, bookings_count=1)
+    bump_daily_stats(db, day, bookings_count=1)
+    
+    commit_booking(db, flush_only=True)
+    booking_id = db_booking.id
     
     # Add karma points for booking
-    update_user_karma(db, user_id, 2)
+    record_karma(db, user_id, 2, "booking", booking_id)
+    commit_booking(db)
+    after_commit(booking_index.add, booking_id, booking.room_id, booking.start_time, booking.end_time)
+    after_commit(booking_events.booked, booking_id, booking.room_id, booking.start_time, booking.end_time)
     
     return db_booking
 
-def get_bookings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Booking).order_by(models.Booking.start_time.desc()).offset(skip).limit(limit).all()
+MAX_BULK_OCCURRENCES = 200
 
-def get_user_bookings(db: Session, user_id: int):
-    return db.query(models.Booking).filter(
-        models.Booking.user_id == user_id
-    ).order_by(models.Booking.start_time.desc()).all()
+def expand_booking_occurrences(bulk: schemas.BookingBulkCreate):
+    """(start_time, end_time) pairs of an explicit list or a daily/weekly series"""
+    if bulk.occurrences is not None:
+        return [(o.start_time, o.end_time) for o in bulk.occurrences]
+    if bulk.start_time is None or bulk.end_time is None:
+        return []
+    if bulk.recurrence is None:
+        return [(bulk.start_time, bulk.end_time)]
+    
+    step = timedelta(days=bulk.recurrence.interval * (7 if bulk.recurrence.freq == "weekly" else 1))
+    start_time, end_time = bulk.start_time, bulk.end_time
+    occurrences = []
+    # One extra occurrence lets the caller detect an oversized series
+    while start_time <= bulk.recurrence.until and len(occurrences) <= MAX_BULK_OCCURRENCES:
+        occurrences.append((start_time, end_time))
+        start_time, end_time = start_time + step, end_time + step
+    return occurrences
 
-def get_room_bookings(db: Session, room_id: int, start_date: datetime = None, end_date: datetime = None):
-    query = db.query(models.Booking).filter(models.Booking.room_id == room_id)
+def create_bookings_bulk(db: Session, bulk: schemas.BookingBulkCreate, user_id: int,
+                         max_created: int = None):
+    """Create every non-conflicting occurrence in one transaction
+    
+    All occurrences are checked against existing bookings with a single
+    query. At most `max_created` bookings are created (the user's remaining
+    active-booking allowance). Returns a result per occurrence: created,
+    conflict, invalid or limit.
+    """
+    occurrences = expand_booking_occurrences(bulk)
+    if not occurrences:
+        raise ValueError("No occurrences to book")
+    if len(occurrences) > MAX_BULK_OCCURRENCES:
+        raise ValueError(f"At most {MAX_BULK_OCCURRENCES} occurrences per request")
+    
+    results = [
+        {"start_time": start, "end_time": end, "status": "invalid", "booking_id": None,
+         "detail": "Invalid booking time. Check time constraints."}
+        for start, end in occurrences
+    ]
+    valid = [
+        i for i, (start, end) in enumerate(occurrences)
+        if end > start and validate_booking_time(schemas.BookingOccurrence(start_time=start, end_time=end))
+    ]
+    
+    # Confirmed bookings never overlap, so in a list sorted by start the
+    # predecessor is the only candidate for a conflict
+    taken = []
+    if valid:
+        lock_room_bookings(db, bulk.room_id)
+        taken = db.query(models.Booking.start_time, models.Booking.end_time).filter(
+            models.Booking.room_id == bulk.room_id,
+            models.Booking.status == "confirmed",
+            models.Booking.start_time < max(occurrences[i][1] for i in valid),
+            models.Booking.end_time > min(occurrences[i][0] for i in valid)
+        ).order_by(models.Booking.start_time).all()
+    starts = [start for start, _ in taken]
+    ends = [end for _, end in taken]
+    
+    created = []
+    for i in valid:
+        start, end = occurrences[i]
+        pos = bisect_left(starts, end)
+        if pos > 0 and ends[pos - 1] > start:
+            results[i].update(status="conflict", detail="Room is already booked for this time period")
+            continue
+        if max_created is not None and len(created) >= max_created:
+            results[i].update(status="limit", detail="Maximum number of active bookings reached")
+            continue
+        starts.insert(pos, start)
+        ends.insert(pos, end)
+        created.append((i, models.Booking(
+            room_id=bulk.room_id, user_id=user_id, purpose=bulk.purpose,
+            start_time=start, end_time=end
+        )))
+    
+    if created:
+        db.add_all([booking for _, booking in created])
+        for _, booking in created:
+            day = booking.start_time.date()
+            bump_user_daily_stats(db, user_id, day, bookings_count=1)
+            bump_daily_stats(db, day, bookings_count=1)
+        commit_booking(db, flush_only=True)
+        rows = [(i, booking.id, booking.start_time, booking.end_time) for i, booking in created]
+        
+        db.add_all([
+            models.KarmaEvent(user_id=user_id, delta=2, reason="booking", source_id=booking_id)
+            for _, booking_id, _, _ in rows
+        ])
+        add_user_karma(db, user_id, 2 * len(created))
+        commit_booking(db)
+        
+        for i, booking_id, start, end in rows:
+            results[i].update(status="created", booking_id=booking_id, detail=None)
+            after_commit(booking_index.add, booking_id, bulk.room_id, start, end)
+            after_commit(booking_events.booked, booking_id, bulk.room_id, start, end)
+    
+    return {"room_id": bulk.room_id, "created": len(created), "occurrences": results}
+
+def booking_read_query(db: Session):
+    """Bookings with user and room joined in the same SELECT (no lazy loads per row)"""
+    return db.query(models.Booking).options(
+        joinedload(models.Booking.user),
+        joinedload(models.Booking.room)
+    )
+
+def get_bookings(db: Session, page: PageParams = None):
+    return keyset_page(
+        booking_read_query(db), models.Booking.start_time, models.Booking.id, page or PageParams()
+    )
+
+def get_user_bookings(db: Session, user_id: int, page: PageParams = None):
+    return keyset_page(
+        booking_read_query(db).filter(models.Booking.user_id == user_id),
+        models.Booking.start_time, models.Booking.id, page or PageParams()
+    )
+
+def count_user_bookings(db: Session, user_id: int, status: str = "confirmed", ending_after: datetime = None):
+    query = db.query(func.count(models.Booking.id)).filter(
+        models.Booking.user_id == user_id,
+        models.Booking.status == status
+    )
+    if ending_after is not None:
+        query = query.filter(models.Booking.end_time > ending_after)
+    return query.scalar()
+
+def get_room_bookings(db: Session, room_id: int, start_date: datetime = None, end_date: datetime = None,
+                      page: PageParams = None):
+    query = booking_read_query(db).filter(models.Booking.room_id == room_id)
     
     if start_date:
         query = query.filter(models.Booking.start_time >= start_date)
     if end_date:
         query = query.filter(models.Booking.end_time <= end_date)
     
-    return query.order_by(models.Booking.start_time).all()
+    return keyset_page(
+        query, models.Booking.start_time, models.Booking.id, page or PageParams(), descending=False
+    )
 
-def get_booking(db: Session, booking_id: int):
-    return db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+def get_booking(db: Session, booking_id: int, reload: bool = False):
+    query = booking_read_query(db).filter(models.Booking.id == booking_id)
+    if reload:
+        query = query.populate_existing()
+    return query.first()
 
 def update_booking(db: Session, booking_id: int, booking_update: schemas.BookingUpdate):
     db_booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
     if db_booking:
+        previous = (db_booking.status, db_booking.room_id, db_booking.start_time, db_booking.end_time)
         update_data = booking_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_booking, field, value)
+        if db_booking.status == "confirmed" and (
+            "start_time" in update_data or "end_time" in update_data or "status" in update_data
+        ):
+            check_booking_conflict(
+                db, db_booking.room_id, db_booking.start_time, db_booking.end_time,
+                exclude_id=db_booking.id
+            )
         db_booking.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_booking)
+        commit_booking(db)
+        db_booking = get_booking(db, booking_id, reload=True)
+        after_commit(booking_index.put, db_booking)
+        current = (db_booking.status, db_booking.room_id, db_booking.start_time, db_booking.end_time)
+        if current != previous:
+            if previous[0] == "confirmed":
+                after_commit(booking_events.released, booking_id, *previous[1:])
+            if current[0] == "confirmed":
+                after_commit(booking_events.booked, booking_id, *current[1:])
     return db_booking
 
 def cancel_booking(db: Session, booking_id: int):
     db_booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
     if db_booking:
+        was_confirmed = db_booking.status == "confirmed"
         db_booking.status = "cancelled"
         db_booking.updated_at = datetime.utcnow()
         db.commit()
-        db.refresh(db_booking)
+        db_booking = get_booking(db, booking_id, reload=True)
+        after_commit(booking_index.remove, db_booking.id)
+        if was_confirmed:
+            after_commit(
+                booking_events.released,
+                db_booking.id, db_booking.room_id, db_booking.start_time, db_booking.end_time
+            )
     return db_booking
 
-def get_room_availability(db: Session, room_id: int, date: datetime):
-    """Get available time slots for a room on a specific date"""
+def complete_past_bookings(db: Session, ended_before: datetime, batch_size: int = 500):
+    """Marks confirmed bookings that ended before `ended_before` as completed, in bounded batches"""
+    completed = 0
+    while True:
+        batch = complete_past_bookings_batch(db, ended_before, batch_size)
+        completed += batch
+        if batch < batch_size:
+            return completed
+
+def complete_past_bookings_batch(db: Session, ended_before: datetime, batch_size: int = 500):
+    """One batch of complete_past_bookings in its own commit; returns the number of bookings"""
+    booking_ids = [booking_id for booking_id, in db.query(models.Booking.id).filter(
+        models.Booking.status == "confirmed",
+        models.Booking.end_time < ended_before
+    ).limit(batch_size)]
+    if not booking_ids:
+        return 0
+    db.query(models.Booking).filter(
+        models.Booking.id.in_(booking_ids),
+        models.Booking.status == "confirmed"
+    ).update(
+        {models.Booking.status: "completed", models.Booking.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.commit()
+    for booking_id in booking_ids:
+        after_commit(booking_index.remove, booking_id)
+    return len(booking_ids)
+
+def get_room_availability(db: Session, room_id: int, date: datetime,
+                          slot_minutes: int = 60, min_duration: int = None):
+    """Get available time slots for a room on a specific date
+    
+    Without `min_duration` every free slot is listed. With it, maximal free
+    windows of at least `min_duration` minutes are returned instead.
+    """
     start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+    end_of_day = start_of_day + timedelta(days=1)
     
     # Get all confirmed bookings for the room on this date
-    bookings = db.query(models.Booking).filter(
-        models.Booking.room_id == room_id,
-        models.Booking.status == "confirmed",
-        models.Booking.start_time >= start_of_day,
-        models.Booking.end_time <= end_of_day
-    ).order_by(models.Booking.start_time).all()
+    if booking_index.fresh(db, start_of_day):
+        bookings = [
+            (start, end) for start, end, _ in
+            booking_index.overlapping(room_id, start_of_day, end_of_day)
+        ]
+    else:
+        bookings = db.query(models.Booking.start_time, models.Booking.end_time).filter(
+            models.Booking.room_id == room_id,
+            models.Booking.status == "confirmed",
+            models.Booking.start_time < end_of_day,
+            models.Booking.end_time > start_of_day
+        ).all()
     
-    # Generate available slots (assuming 1-hour slots from 9 AM to 9 PM)
-    available_slots = []
-    current_time = start_of_day.replace(hour=9)
-    end_time = start_of_day.replace(hour=21)
+    # Free slots of the working day (9:00 - 21:00) as a bitmap
+    free = availability.full_mask(slot_minutes) & ~availability.busy_mask(
+        bookings, start_of_day, slot_minutes
+    )
     
-    while current_time < end_time:
-        slot_end = current_time + timedelta(hours=1)
-        
-        # Check if this slot conflicts with any booking
-        is_available = True
-        for booking in bookings:
-            if (current_time < booking.end_time and slot_end > booking.start_time):
-                is_available = False
-                break
-        
-        if is_available:
+    if min_duration:
+        min_slots = -(-min_duration // slot_minutes)
+        return [
+            {
+                "start_time": availability.slot_start(start_of_day, first, slot_minutes).isoformat(),
+                "end_time": availability.slot_start(start_of_day, first + length, slot_minutes).isoformat(),
+                "duration_minutes": length * slot_minutes
+            }
+            for first, length in availability.free_runs(free, min_slots)
+        ]
+    
+    available_slots = []
+    for i in range(availability.slot_count(slot_minutes)):
+        if free >> i & 1:
             available_slots.append({
-                "start_time": current_time.isoformat(),
-                "end_time": slot_end.isoformat(),
-                "duration_hours": 1
+                "start_time": availability.slot_start(start_of_day, i, slot_minutes).isoformat(),
+                "end_time": availability.slot_start(start_of_day, i + 1, slot_minutes).isoformat(),
+                "duration_hours": slot_minutes / 60
             })
-        
-        current_time = slot_end
     
-    return available_slots
\ No newline at end of file
+    return available_slots
+
+def get_availability_matrix(db: Session, start_date: date, days: int = 1,
+                            min_capacity: int = None, equipment: List[str] = None,
+                            slot_minutes: int = 60):
+    """Busy-slot bitmasks for every active room over `days` days"""
+    first_day = datetime.combine(start_date, datetime.min.time())
+    last_day = first_day + timedelta(days=days)
+    required = availability.parse_equipment(",".join(equipment or []))
+    
+    query = db.query(models.Room).filter(models.Room.is_active == True)
+    if min_capacity:
+        query = query.filter(models.Room.capacity >= min_capacity)
+    rooms = [
+        room for room in query.order_by(models.Room.id).all()
+        if availability.has_equipment(room.equipment, required)
+    ]
+    
+    # Confirmed bookings of all selected rooms: from the index or one query
+    intervals = {room.id: [] for room in rooms}
+    if booking_index.fresh(db, first_day):
+        for room_id in intervals:
+            intervals[room_id] = [
+                (start, end) for start, end, _ in
+                booking_index.overlapping(room_id, first_day, last_day)
+            ]
+    elif intervals:
+        bookings = db.query(
+            models.Booking.room_id, models.Booking.start_time, models.Booking.end_time
+        ).filter(
+            models.Booking.room_id.in_(list(intervals)),
+            models.Booking.status == "confirmed",
+            models.Booking.start_time < last_day,
+            models.Booking.end_time > first_day
+        ).all()
+        for room_id, start, end in bookings:
+            intervals[room_id].append((start, end))
+    
+    day_list = [first_day + timedelta(days=i) for i in range(days)]
+    return {
+        "start_date": first_day.date().isoformat(),
+        "days": days,
+        "slot_minutes": slot_minutes,
+        "slots": availability.slot_labels(slot_minutes),
+        "rooms": [
+            {
+                "room_id": room.id,
+                "room_name": room.name,
+                "capacity": room.capacity,
+                "equipment": room.equipment,
+                # bit i set = slot i is busy
+                "busy": {
+                    day.date().isoformat(): availability.busy_mask(intervals[room.id], day, slot_minutes)
+                    for day in day_list
+                }
+            }
+            for room in rooms
+        ]
+    }
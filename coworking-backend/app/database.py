@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -8,12 +10,106 @@ load_dotenv()
 
 SQLITE_URL = os.getenv("DATABASE_URL", "sqlite:///./coworking.db")
 
+def get_async_url(url: str) -> str:
+    """sqlite:// -> sqlite+aiosqlite://, postgresql:// -> postgresql+asyncpg://"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", get_async_url(SQLITE_URL))
+# Отдельный адрес для чтения (например, реплика PostgreSQL); для SQLite - тот же файл
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL", ASYNC_DATABASE_URL)
+
+# Пулы соединений: у aiosqlite по умолчанию NullPool, то есть новое
+# соединение (и поток) на каждую сессию
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", 10))
+
+# Профиль SQLite, применяется к каждому новому соединению (SQLITE_TUNING=0 - выключить).
+# WAL: читатели не блокируют писателя и друг друга; busy_timeout: ждать
+# освобождения блокировки вместо немедленного "database is locked";
+# synchronous=NORMAL в режиме WAL безопасен при сбое процесса и не делает
+# fsync на каждый commit
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Отрицательное значение - размер в КиБ
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024)),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def is_sqlite_memory(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.split("://", 1)[1] in ("", "/"))
+
+def apply_sqlite_profile(engine, read_only: bool = False):
+    """Выполняет PRAGMA профиля при каждом новом соединении engine (sync или async)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+    pragmas = dict(SQLITE_PRAGMAS) if SQLITE_TUNING else {}
+    if is_sqlite_memory(str(sync_engine.url)):
+        pragmas.pop("journal_mode", None)
+    if read_only:
+        # Запись через это соединение завершится ошибкой
+        pragmas["query_only"] = "ON"
+    
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+def pool_options(url: str, pool_size: int, is_async: bool = False) -> dict:
+    # SQLite в памяти живет в одном соединении (StaticPool), пул не нужен
+    if is_sqlite_memory(url):
+        return {}
+    return {
+        "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+        "pool_size": pool_size,
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+
 engine = create_engine(
     SQLITE_URL, 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    **pool_options(SQLITE_URL, DB_POOL_SIZE)
 )
+apply_sqlite_profile(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, DB_POOL_SIZE, is_async=True)
+)
+apply_sqlite_profile(async_engine)
+# expire_on_commit=False: после commit объекты можно сериализовать без
+# повторной (ленивой) загрузки атрибутов вне async-контекста
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Соединения только для чтения: GET-запросы (get_read_db) берут их из
+# отдельного пула и в режиме WAL не ждут писателя. SQLite в памяти - одна
+# база на соединение, поэтому чтение идет через основной engine
+if is_sqlite_memory(ASYNC_READ_DATABASE_URL):
+    async_read_engine = async_engine
+else:
+    async_read_engine = create_async_engine(
+        ASYNC_READ_DATABASE_URL, **pool_options(ASYNC_READ_DATABASE_URL, READ_POOL_SIZE, is_async=True)
+    )
+    apply_sqlite_profile(async_read_engine, read_only=True)
+ReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -21,4 +117,23 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def run_migrations():
+    """Применяет миграции Alembic (migrations/) до последней ревизии"""
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    async with ReadSessionLocal() as db:
+        yield db
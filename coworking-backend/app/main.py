@@ -1,21 +1,108 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, SessionLocal, Base
+from .database import engine, SessionLocal, Base, run_migrations
 from . import models
-from .routers import auth, users, visits, admin, donations, rooms, bookings
-from .database import get_db
-from sqlalchemy.orm import Session
-
-Base.metadata.create_all(bind=engine)
+from .utils.booking_index import booking_index
+from .utils.leaderboard import leaderboards
+from .utils.occupancy import occupancy
+from .utils.pagination import NEXT_CURSOR_HEADER
+from .utils.checkin_batcher import checkin_batcher
+from .utils.sweeper import sweeper
+from .utils.booking_events import booking_events
+from .utils.write_queue import write_queue, WRITE_QUEUE_ENABLED
+from .utils.password_hashing import password_hasher, PasswordHasherBusy
+from .routers import auth, users, visits, admin, donations, rooms, bookings, export, leaderboard
+from .database import get_read_db
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 app = FastAPI(title="Student Coworking Platform", version="1.0.0")
 
+@app.on_event("startup")
+def apply_migrations():
+    run_migrations()
+
+@app.on_event("startup")
+def load_booking_index():
+    db = SessionLocal()
+    try:
+        booking_index.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def load_occupancy():
+    db = SessionLocal()
+    try:
+        occupancy.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def load_leaderboards():
+    leaderboards.refresh()
+
+@app.on_event("startup")
+def start_password_hasher():
+    password_hasher.warm_up()
+
+@app.on_event("startup")
+def start_write_queue():
+    if WRITE_QUEUE_ENABLED:
+        write_queue.start()
+
+@app.on_event("startup")
+async def start_sweeper():
+    sweeper.start()
+
+@app.on_event("startup")
+async def start_leaderboard_refresh():
+    leaderboards.start()
+
+@app.on_event("startup")
+async def start_booking_events():
+    booking_events.start()
+
+@app.on_event("shutdown")
+async def stop_sweeper():
+    await sweeper.stop()
+
+@app.on_event("shutdown")
+async def stop_leaderboard_refresh():
+    await leaderboards.stop()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def flush_checkins():
+    await checkin_batcher.drain()
+
+@app.on_event("shutdown")
+def stop_write_queue():
+    write_queue.stop()
+
+@app.on_event("shutdown")
+def stop_booking_events():
+    booking_events.stop()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts, try again later"},
+        headers={"Retry-After": "1"}
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -24,16 +111,18 @@ app.include_router(visits.router, prefix="/visits", tags=["visits"])
 app.include_router(donations.router, prefix="/donations", tags=["donations"])
 app.include_router(rooms.router, prefix="/api", tags=["rooms"])
 app.include_router(bookings.router, prefix="/api", tags=["bookings"])
+app.include_router(leaderboard.router, prefix="/leaderboard", tags=["leaderboard"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(export.router, prefix="/admin/export", tags=["export"])
 
 @app.get("/")
 async def root():
     return {"message": "Student Coworking Platform API"}
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_read_db)):
     try:
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
\ No newline at end of file
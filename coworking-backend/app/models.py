@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Date, Float, Boolean, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -30,6 +30,18 @@ class Visit(Base):
     duration_minutes = Column(Integer, default=0)
     
     user = relationship("User", back_populates="visits")
+    
+    __table_args__ = (
+        Index("ix_visits_user_check_in", "user_id", "check_in"),
+        # Keyset-пагинация общего списка посещений
+        Index("ix_visits_check_in_id", "check_in", "id"),
+        # Открытые посещения (заполненность коворкинга); у пользователя не
+        # больше одного открытого посещения
+        Index(
+            "ix_visits_open_user", "user_id", unique=True,
+            sqlite_where=check_out.is_(None), postgresql_where=check_out.is_(None)
+        ),
+    )
 
 class Donation(Base):
     __tablename__ = "donations"
@@ -42,6 +54,11 @@ class Donation(Base):
     is_anonymous = Column(Boolean, default=False)
     
     user = relationship("User", back_populates="donations")
+    
+    __table_args__ = (
+        Index("ix_donations_donation_date", "donation_date"),
+        Index("ix_donations_user_date", "user_id", "donation_date"),
+    )
 
 class Room(Base):
     __tablename__ = "rooms"
@@ -70,4 +87,68 @@ class Booking(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="bookings")
-    room = relationship("Room", back_populates="bookings")
\ No newline at end of file
+    room = relationship("Room", back_populates="bookings")
+    
+    __table_args__ = (
+        # Проверка конфликтов и доступность аудитории
+        Index("ix_bookings_room_status_time", "room_id", "status", "start_time", "end_time"),
+        # Бронирования пользователя по времени
+        Index("ix_bookings_user_start", "user_id", "start_time"),
+        # Keyset-пагинация общего списка бронирований
+        Index("ix_bookings_start_id", "start_time", "id"),
+        # Закончившиеся подтвержденные бронирования (app/utils/sweeper.py);
+        # частичный, чтобы планировщик не брал его для проверки конфликтов
+        Index(
+            "ix_bookings_confirmed_end", "end_time",
+            sqlite_where=status == "confirmed", postgresql_where=status == "confirmed"
+        ),
+    )
+
+# Журнал изменений кармы: только добавление, users.karma - сумма delta
+class KarmaEvent(Base):
+    __tablename__ = "karma_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # visit, booking, donation, adjustment, opening_balance
+    source_id = Column(Integer, nullable=True)  # id посещения / бронирования / пожертвования
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_karma_events_user_created", "user_id", "created_at"),
+    )
+
+# Агрегаты по дням, обновляются в crud вместе с исходными событиями
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    visits_count = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    timed_visits_count = Column(Integer, nullable=False, default=0)  # visits with duration_minutes > 0
+    visit_minutes = Column(Integer, nullable=False, default=0)
+    bookings_count = Column(Integer, nullable=False, default=0)
+    donations_count = Column(Integer, nullable=False, default=0)
+    donations_amount = Column(Float, nullable=False, default=0.0)
+
+class UserDailyStats(Base):
+    __tablename__ = "user_daily_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    visits_count = Column(Integer, nullable=False, default=0)
+    timed_visits_count = Column(Integer, nullable=False, default=0)
+    visit_minutes = Column(Integer, nullable=False, default=0)
+    bookings_count = Column(Integer, nullable=False, default=0)
+    donations_count = Column(Integer, nullable=False, default=0)
+    donations_amount = Column(Float, nullable=False, default=0.0)
+
+# Версии ресурсов для условных GET (app/utils/conditional.py): увеличиваются
+# в той же транзакции, что и изменение, поэтому общие для всех процессов
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+    
+    name = Column(String, primary_key=True)  # rooms, donations
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
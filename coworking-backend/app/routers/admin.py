@@ -1,119 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
-from ..database import get_db
-from .. import models, schemas
-from ..utils.security import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_read_db
+from .. import async_crud, schemas
+from ..utils.permissions import Permission, require
+from ..utils.pagination import PageParams, page_params, set_next_cursor
+from ..utils.principal_cache import principal_cache
+from ..utils.read_cache import read_cache
+from ..utils.booking_events import booking_events
+from ..utils.sweeper import sweeper
+from ..utils.checkin_batcher import checkin_batcher
+from ..utils.write_queue import write_queue
 
 router = APIRouter()
 
 @router.get("/dashboard", response_model=schemas.DashboardStats)
-def get_dashboard_stats(db: Session = Depends(get_db),
-                       current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    # Общая статистика
-    total_users = db.query(func.count(models.User.id)).scalar()
-    
-    # Активные пользователи сегодня
-    today = datetime.now().date()
-    active_users_today = db.query(func.count(models.Visit.user_id.distinct())).filter(
-        func.date(models.Visit.check_in) == today
-    ).scalar()
-    
-    total_visits = db.query(func.count(models.Visit.id)).scalar()
-    
-    total_donations = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).scalar() or 0
-    
-    # Средняя продолжительность посещения
-    avg_duration = db.query(func.avg(models.Visit.duration_minutes)).filter(
-        models.Visit.duration_minutes > 0
-    ).scalar() or 0
-    
-    # DAU за последние 30 дней
-    daily_active_users = {}
-    for i in range(30):
-        day = today - timedelta(days=i)
-        dau = db.query(func.count(models.Visit.user_id.distinct())).filter(
-            func.date(models.Visit.check_in) == day
-        ).scalar() or 0
-        daily_active_users[day.isoformat()] = dau
-    
-    # MAU за последние 12 месяцев
-    monthly_active_users = {}
-    for i in range(12):
-        month_start = today.replace(day=1) - timedelta(days=30*i)
-        month_end = (month_start + timedelta(days=32)).replace(day=1)
-        mau = db.query(func.count(models.Visit.user_id.distinct())).filter(
-            and_(
-                models.Visit.check_in >= month_start,
-                models.Visit.check_in < month_end
-            )
-        ).scalar() or 0
-        monthly_active_users[month_start.strftime("%Y-%m")] = mau
-    
-    return {
-        "total_users": total_users,
-        "active_users_today": active_users_today,
-        "total_visits": total_visits,
-        "total_donations": float(total_donations),
-        "average_visit_duration": float(avg_duration),
-        "daily_active_users": daily_active_users,
-        "monthly_active_users": monthly_active_users
-    }
+async def get_dashboard_stats(db: AsyncSession = Depends(get_read_db),
+                             current_user: schemas.UserResponse = Depends(require(Permission.VIEW_STATISTICS))):
+    return await async_crud.get_dashboard_stats(db)
 
 @router.get("/users/{user_id}/stats", response_model=schemas.UserStats)
-def get_user_stats(user_id: int, db: Session = Depends(get_db),
-                  current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+async def get_user_stats(user_id: int, db: AsyncSession = Depends(get_read_db),
+                        current_user: schemas.UserResponse = Depends(require(Permission.VIEW_STATISTICS))):
+    stats = await async_crud.get_user_statistics(db, user_id=user_id)
+    if not stats:
         raise HTTPException(status_code=404, detail="User not found")
     
-    total_visits = db.query(func.count(models.Visit.id)).filter(
-        models.Visit.user_id == user_id
-    ).scalar()
-    
-    total_donation = db.query(func.coalesce(func.sum(models.Donation.amount), 0)).filter(
-        models.Donation.user_id == user_id
-    ).scalar() or 0
-    
-    avg_duration = db.query(func.avg(models.Visit.duration_minutes)).filter(
-        models.Visit.user_id == user_id,
-        models.Visit.duration_minutes > 0
-    ).scalar() or 0
-    
-    return {
-        "user": user,
-        "total_visits": total_visits,
-        "total_donation": float(total_donation),
-        "average_duration": float(avg_duration)
-    }
+    return stats
 
 @router.get("/users/", response_model=list[schemas.UserResponse])
-def get_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                 current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    return db.query(models.User).offset(skip).limit(limit).all()
+async def get_all_users(response: Response, page: PageParams = Depends(page_params),
+                       db: AsyncSession = Depends(get_read_db),
+                       current_user: schemas.UserResponse = Depends(require(Permission.MANAGE_USERS))):
+    users, next_cursor = await async_crud.get_users(db, page=page)
+    set_next_cursor(response, next_cursor)
+    return users
 
 @router.get("/visits/", response_model=list[schemas.VisitResponse])
-def get_all_visits(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                  current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    return db.query(models.Visit).offset(skip).limit(limit).all()
+async def get_all_visits(response: Response, page: PageParams = Depends(page_params),
+                        db: AsyncSession = Depends(get_read_db),
+                        current_user: schemas.UserResponse = Depends(require(Permission.VIEW_ALL_VISITS))):
+    visits, next_cursor = await async_crud.get_visits(db, page=page)
+    set_next_cursor(response, next_cursor)
+    return visits
 
 @router.get("/donations/", response_model=list[schemas.DonationResponse])
-def get_all_donations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                     current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    return db.query(models.Donation).offset(skip).limit(limit).all()
\ No newline at end of file
+async def get_all_donations(response: Response, page: PageParams = Depends(page_params),
+                           db: AsyncSession = Depends(get_read_db),
+                           current_user: schemas.UserResponse = Depends(require(Permission.VIEW_ALL_DONATIONS))):
+    donations, next_cursor = await async_crud.get_donations(db, page=page)
+    set_next_cursor(response, next_cursor)
+    return donations
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return {"principals": principal_cache.stats(), "reads": read_cache.stats()}
+
+@router.get("/events")
+async def get_booking_events_stats(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return booking_events.stats()
+
+@router.get("/sweeper")
+async def get_sweeper_stats(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return sweeper.stats()
+
+@router.post("/sweeper/run")
+async def run_sweeper(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return await run_in_threadpool(sweeper.run_once)
+
+@router.get("/checkins")
+async def get_checkin_batch_stats(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return checkin_batcher.stats()
+
+@router.get("/write-queue")
+async def get_write_queue_stats(current_user: schemas.UserResponse = Depends(require(Permission.SYSTEM_SETTINGS))):
+    return write_queue.stats()
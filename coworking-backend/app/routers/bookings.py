@@ -1,32 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
-from ..database import get_db
-from .. import crud, schemas
+from ..database import get_async_db, get_read_db
+from .. import async_crud, schemas
 from ..utils.security import get_current_user
+from ..utils.pagination import PageParams, page_params, set_next_cursor
 from ..utils.permissions import (
-    Permission, has_permission, check_booking_access,
-    validate_booking_limits, validate_booking_time, can_cancel_booking
+    Permission, require, has_permission, check_booking_access,
+    validate_booking_limits, validate_booking_time, can_cancel_booking,
+    remaining_booking_slots, MAX_ACTIVE_BOOKINGS
 )
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
 @router.post("/", response_model=schemas.BookingResponse)
-def create_booking(
+async def create_booking(
     booking: schemas.BookingCreate,
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.CREATE_BOOKINGS))
 ):
     """Create a new booking"""
-    # Check permissions
-    if not has_permission(current_user, Permission.CREATE_BOOKINGS):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission 'bookings:create' required"
-        )
-    
     # Validate booking time constraints
     if not validate_booking_time(booking):
         raise HTTPException(
@@ -35,14 +30,14 @@ def create_booking(
         )
     
     # Check booking limits
-    if not validate_booking_limits(current_user, db):
+    if not await db.run_sync(lambda session: validate_booking_limits(current_user, session)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Maximum number of active bookings reached (3)"
+            detail=f"Maximum number of active bookings reached ({MAX_ACTIVE_BOOKINGS})"
         )
     
     # Check if room exists
-    room = crud.get_room(db=db, room_id=booking.room_id)
+    room = await async_crud.get_room(db=db, room_id=booking.room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -56,14 +51,11 @@ def create_booking(
         )
     
     try:
-        db_booking = crud.create_booking(db=db, booking=booking, user_id=current_user.id)
+        db_booking = await async_crud.create_booking(db=db, booking=booking, user_id=current_user.id)
         
-        # Create response with user and room info
-        booking_dict = db_booking.__dict__.copy()
-        booking_dict['user_name'] = current_user.full_name
-        booking_dict['room'] = room
-        
-        return schemas.BookingResponse(**booking_dict)
+        return schemas.BookingResponse.from_booking(
+            db_booking, user_name=current_user.full_name, room=room
+        )
     
     except ValueError as e:
         raise HTTPException(
@@ -71,55 +63,92 @@ def create_booking(
             detail=str(e)
         )
 
+@router.post("/bulk", response_model=schemas.BookingBulkResponse)
+async def create_bookings_bulk(
+    bulk: schemas.BookingBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.CREATE_BOOKINGS))
+):
+    """Create a recurring series or a list of bookings for one room
+    
+    Every occurrence is validated and checked for conflicts; the ones that
+    pass are created in a single transaction, up to the user's remaining
+    active-booking limit. The result lists the outcome of each occurrence.
+    """
+    # The new occurrences count against the same limit as single bookings
+    remaining = await db.run_sync(lambda session: remaining_booking_slots(current_user, session))
+    if not remaining:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum number of active bookings reached ({MAX_ACTIVE_BOOKINGS})"
+        )
+    
+    room = await async_crud.get_room(db=db, room_id=bulk.room_id)
+    if not room:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+    
+    if not room.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Room is not available for booking"
+        )
+    
+    try:
+        return await async_crud.create_bookings_bulk(
+            db=db, bulk=bulk, user_id=current_user.id, max_created=remaining
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/", response_model=List[schemas.BookingResponse])
-def get_bookings(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+async def get_bookings(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.UserResponse = Depends(get_current_user)
 ):
-    """Get all bookings (admin only) or user's own bookings"""
-    if current_user.is_admin:
-        bookings = crud.get_bookings(db=db, skip=skip, limit=limit)
-    else:
-        bookings = crud.get_user_bookings(db=db, user_id=current_user.id)
+    """Get all bookings (admin only) or user's own bookings
     
-    # Add user names to booking responses
-    booking_responses = []
-    for booking in bookings:
-        booking_dict = booking.__dict__.copy()
-        booking_dict['user_name'] = booking.user.full_name if booking.user else None
-        booking_dict['room'] = booking.room
-        booking_responses.append(schemas.BookingResponse(**booking_dict))
+    Newest first; the cursor for the next page is returned in X-Next-Cursor.
+    """
+    if has_permission(current_user, Permission.VIEW_ALL_BOOKINGS):
+        bookings, next_cursor = await async_crud.get_bookings(db=db, page=page)
+    else:
+        bookings, next_cursor = await async_crud.get_user_bookings(db=db, user_id=current_user.id, page=page)
     
-    return booking_responses
+    set_next_cursor(response, next_cursor)
+    return [schemas.BookingResponse.from_booking(booking) for booking in bookings]
 
 @router.get("/my", response_model=List[schemas.BookingResponse])
-def get_my_bookings(
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+async def get_my_bookings(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.VIEW_OWN_BOOKINGS))
 ):
     """Get current user's bookings"""
-    bookings = crud.get_user_bookings(db=db, user_id=current_user.id)
+    bookings, next_cursor = await async_crud.get_user_bookings(db=db, user_id=current_user.id, page=page)
     
-    # Add user names to booking responses
-    booking_responses = []
-    for booking in bookings:
-        booking_dict = booking.__dict__.copy()
-        booking_dict['user_name'] = current_user.full_name
-        booking_dict['room'] = booking.room
-        booking_responses.append(schemas.BookingResponse(**booking_dict))
-    
-    return booking_responses
+    set_next_cursor(response, next_cursor)
+    return [
+        schemas.BookingResponse.from_booking(booking, user_name=current_user.full_name)
+        for booking in bookings
+    ]
 
 @router.get("/{booking_id}", response_model=schemas.BookingResponse)
-def get_booking(
+async def get_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.UserResponse = Depends(get_current_user)
 ):
     """Get booking by ID"""
-    booking = crud.get_booking(db=db, booking_id=booking_id)
+    booking = await async_crud.get_booking(db=db, booking_id=booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -127,28 +156,23 @@ def get_booking(
         )
     
     # Check if user can access this booking
-    if not current_user.is_admin and booking.user_id != current_user.id:
+    if not check_booking_access(current_user, booking.user_id, "view"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to access this booking"
         )
     
-    # Create response with user and room info
-    booking_dict = booking.__dict__.copy()
-    booking_dict['user_name'] = booking.user.full_name if booking.user else None
-    booking_dict['room'] = booking.room
-    
-    return schemas.BookingResponse(**booking_dict)
+    return schemas.BookingResponse.from_booking(booking)
 
 @router.put("/{booking_id}", response_model=schemas.BookingResponse)
-def update_booking(
+async def update_booking(
     booking_id: int,
     booking_update: schemas.BookingUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserResponse = Depends(get_current_user)
 ):
     """Update booking"""
-    booking = crud.get_booking(db=db, booking_id=booking_id)
+    booking = await async_crud.get_booking(db=db, booking_id=booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,7 +180,7 @@ def update_booking(
         )
     
     # Check if user can update this booking
-    if not current_user.is_admin and booking.user_id != current_user.id:
+    if not check_booking_access(current_user, booking.user_id, "edit"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update this booking"
@@ -170,18 +194,13 @@ def update_booking(
         )
     
     try:
-        updated_booking = crud.update_booking(
+        updated_booking = await async_crud.update_booking(
             db=db, 
             booking_id=booking_id, 
             booking_update=booking_update
         )
         
-        # Create response with user and room info
-        booking_dict = updated_booking.__dict__.copy()
-        booking_dict['user_name'] = updated_booking.user.full_name if updated_booking.user else None
-        booking_dict['room'] = updated_booking.room
-        
-        return schemas.BookingResponse(**booking_dict)
+        return schemas.BookingResponse.from_booking(updated_booking)
     
     except ValueError as e:
         raise HTTPException(
@@ -190,13 +209,13 @@ def update_booking(
         )
 
 @router.delete("/{booking_id}", response_model=schemas.BookingResponse)
-def cancel_booking(
+async def cancel_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserResponse = Depends(get_current_user)
 ):
     """Cancel booking"""
-    booking = crud.get_booking(db=db, booking_id=booking_id)
+    booking = await async_crud.get_booking(db=db, booking_id=booking_id)
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -204,7 +223,7 @@ def cancel_booking(
         )
     
     # Check if user can cancel this booking
-    if not current_user.is_admin and booking.user_id != current_user.id:
+    if not check_booking_access(current_user, booking.user_id, "cancel"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to cancel this booking"
@@ -217,11 +236,6 @@ def cancel_booking(
             detail="Cannot cancel past bookings"
         )
     
-    cancelled_booking = crud.cancel_booking(db=db, booking_id=booking_id)
-    
-    # Create response with user and room info
-    booking_dict = cancelled_booking.__dict__.copy()
-    booking_dict['user_name'] = cancelled_booking.user.full_name if cancelled_booking.user else None
-    booking_dict['room'] = cancelled_booking.room
+    cancelled_booking = await async_crud.cancel_booking(db=db, booking_id=booking_id)
     
-    return schemas.BookingResponse(**booking_dict)
+    return schemas.BookingResponse.from_booking(cancelled_booking)
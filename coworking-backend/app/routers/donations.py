@@ -1,32 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from .. import crud, schemas
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, get_read_db
+from .. import async_crud, schemas
 from ..utils.security import get_current_user
+from ..utils.permissions import Permission, require, is_owner_or_admin
+from ..utils.conditional import conditional
+from ..utils.pagination import PageParams, page_params, set_next_cursor
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.DonationResponse)
-def create_donation(donation: schemas.DonationCreate, db: Session = Depends(get_db),
-                   current_user: schemas.UserResponse = Depends(get_current_user)):
-    if current_user.id != donation.user_id and not current_user.is_admin:
+async def create_donation(donation: schemas.DonationCreate, db: AsyncSession = Depends(get_async_db),
+                         current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, donation.user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.create_donation(db=db, donation=donation)
+    return await async_crud.create_donation(db=db, donation=donation)
 
 @router.get("/", response_model=list[schemas.DonationResponse])
-def get_all_donations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                     current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return crud.get_donations(db, skip=skip, limit=limit)
+async def get_all_donations(response: Response, page: PageParams = Depends(page_params),
+                           db: AsyncSession = Depends(get_read_db),
+                           current_user: schemas.UserResponse = Depends(require(Permission.VIEW_ALL_DONATIONS))):
+    donations, next_cursor = await async_crud.get_donations(db, page=page)
+    set_next_cursor(response, next_cursor)
+    return donations
 
 @router.get("/recent", response_model=list[schemas.DonationResponse])
-def get_recent_donations(limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_recent_donations(db, limit=limit)
+async def get_recent_donations(limit: int = 10, db: AsyncSession = Depends(get_read_db),
+                               _: None = Depends(conditional("donations"))):
+    return await async_crud.get_recent_donations(db, limit=limit)
 
 @router.get("/stats")
-def get_donations_stats(days: int = 30, db: Session = Depends(get_db),
-                       current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return crud.get_donations_stats(db, days=days)
+async def get_donations_stats(days: int = 30, db: AsyncSession = Depends(get_read_db),
+                             current_user: schemas.UserResponse = Depends(require(Permission.VIEW_STATISTICS))):
+    return await async_crud.get_donations_stats(db, days=days)
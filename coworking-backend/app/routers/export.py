@@ -0,0 +1,122 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
+import csv
+import io
+import json
+
+from ..database import async_read_engine
+from .. import models, schemas
+from ..utils.permissions import Permission, require
+
+# Потоковая выгрузка для бухгалтерии и аналитики. Строки читаются
+# серверным курсором партиями по EXPORT_BATCH_SIZE и сразу отдаются
+# клиенту, поэтому память не растет с размером таблицы.
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 1000
+
+# ресурс -> (столбцы выгрузки, столбец для фильтра по датам)
+EXPORTS = {
+    "users": ((
+        models.User.id, models.User.email, models.User.full_name, models.User.karma,
+        models.User.total_donated, models.User.is_active, models.User.is_admin,
+        models.User.created_at
+    ), models.User.created_at),
+    "visits": ((
+        models.Visit.id, models.Visit.user_id, models.Visit.check_in,
+        models.Visit.check_out, models.Visit.duration_minutes
+    ), models.Visit.check_in),
+    "donations": ((
+        models.Donation.id, models.Donation.user_id, models.Donation.amount,
+        models.Donation.message, models.Donation.is_anonymous, models.Donation.donation_date
+    ), models.Donation.donation_date),
+    "bookings": ((
+        models.Booking.id, models.Booking.room_id, models.Booking.user_id,
+        models.Booking.start_time, models.Booking.end_time, models.Booking.purpose,
+        models.Booking.status, models.Booking.created_at, models.Booking.updated_at
+    ), models.Booking.start_time),
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _format_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+def _format_ndjson(header, rows):
+    return "".join(
+        json.dumps(dict(zip(header, row)), default=_json_default, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+async def _stream_rows(statement, columns, export_format):
+    header = [column.key for column in columns]
+    if export_format == "csv":
+        yield _format_csv(header, [])
+    
+    async with async_read_engine.connect() as connection:
+        result = await connection.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            if export_format == "csv":
+                yield _format_csv(None, rows)
+            else:
+                yield _format_ndjson(header, rows)
+
+@router.get("/{resource}")
+async def export_data(
+    resource: str,
+    format: str = "csv",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: schemas.UserResponse = Depends(require(Permission.EXPORT_DATA))
+):
+    """Stream users, visits, donations or bookings as CSV or NDJSON
+    
+    `start_date` / `end_date` filter on the resource's main date
+    (registration, check-in, donation date, booking start).
+    """
+    if resource not in EXPORTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown export. Available: {', '.join(EXPORTS)}"
+        )
+    
+    if format not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be csv or ndjson"
+        )
+    
+    columns, date_column = EXPORTS[resource]
+    statement = select(*columns)
+    if start_date:
+        statement = statement.where(date_column >= start_date)
+    if end_date:
+        statement = statement.where(date_column < end_date)
+    statement = statement.order_by(columns[0])
+    
+    filename = f"{resource}_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+    return StreamingResponse(
+        _stream_rows(statement, columns, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
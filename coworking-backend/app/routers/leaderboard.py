@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from .. import schemas
+from ..utils.security import get_current_user
+from ..utils.leaderboard import leaderboards, METRICS, PERIODS
+
+router = APIRouter()
+
+@router.get("/{metric}", response_model=schemas.Leaderboard)
+async def get_leaderboard(metric: str, period: str = "all", limit: int = Query(10, ge=1, le=100),
+                          current_user: schemas.UserResponse = Depends(get_current_user)):
+    if metric not in METRICS:
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Period must be one of: {', '.join(PERIODS)}")
+    return leaderboards.top(metric, period, limit)
@@ -1,61 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from datetime import datetime
+from datetime import datetime, date
 
-from ..database import get_db
-from .. import crud, schemas
-from ..utils.security import get_current_user
-from ..utils.permissions import (
-    Permission, has_permission, check_room_access, 
-    is_admin, require_permission
-)
+from ..database import get_async_db, get_read_db
+from .. import async_crud, schemas
+from ..utils import availability
+from ..utils.pagination import PageParams, page_params, set_next_cursor
+from ..utils.permissions import Permission, require
+from ..utils.conditional import conditional
+from ..utils.booking_events import booking_events, event_stream
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
 
+def validate_slot_minutes(slot_minutes: int):
+    if slot_minutes not in availability.ALLOWED_SLOT_MINUTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"slot_minutes must be one of {list(availability.ALLOWED_SLOT_MINUTES)}"
+        )
+
 @router.post("/", response_model=schemas.RoomResponse)
-def create_room(
+async def create_room(
     room: schemas.RoomCreate,
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.CREATE_ROOMS))
 ):
     """Create a new room (admin only)"""
-    if not has_permission(current_user, Permission.CREATE_ROOMS):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission 'rooms:create' required"
-        )
-    
     # Check if room name already exists
-    existing_room = crud.get_room_by_name(db, room.name)
+    existing_room = await async_crud.get_room_by_name(db, room.name)
     if existing_room:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Room with this name already exists"
         )
     
-    return crud.create_room(db=db, room=room)
+    return await async_crud.create_room(db=db, room=room)
 
 @router.get("/", response_model=List[schemas.RoomResponse])
-def get_rooms(
+async def get_rooms(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.VIEW_ROOMS)),
+    version: int = Depends(conditional("rooms"))
 ):
     """Get list of rooms"""
-    if not has_permission(current_user, Permission.VIEW_ROOMS):
+    return await async_crud.get_rooms(db=db, skip=skip, limit=limit, active_only=active_only, version=version)
+
+@router.get("/availability")
+async def get_availability_matrix(
+    start_date: date,
+    days: int = 1,
+    min_capacity: int = None,
+    equipment: str = None,
+    slot_minutes: int = 60,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get free/busy matrix of all active rooms for up to a month
+    
+    `equipment` is a comma-separated list of required items. Each room gets
+    a busy bitmask per day: bit i is set when slot `slots[i]` is booked.
+    """
+    if not 1 <= days <= 31:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Permission 'rooms:view' required"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must be between 1 and 31"
         )
-    return crud.get_rooms(db=db, skip=skip, limit=limit, active_only=active_only)
+    validate_slot_minutes(slot_minutes)
+    
+    return await async_crud.get_availability_matrix(
+        db=db,
+        start_date=start_date,
+        days=days,
+        min_capacity=min_capacity,
+        equipment=equipment.split(",") if equipment else None,
+        slot_minutes=slot_minutes
+    )
 
 @router.get("/{room_id}", response_model=schemas.RoomResponse)
-def get_room(room_id: int, db: Session = Depends(get_db)):
+async def get_room(room_id: int, db: AsyncSession = Depends(get_read_db),
+                   version: int = Depends(conditional("rooms"))):
     """Get room by ID"""
-    room = crud.get_room(db=db, room_id=room_id)
+    room = await async_crud.get_room(db=db, room_id=room_id, version=version)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,20 +93,14 @@ def get_room(room_id: int, db: Session = Depends(get_db)):
     return room
 
 @router.put("/{room_id}", response_model=schemas.RoomResponse)
-def update_room(
+async def update_room(
     room_id: int,
     room_update: schemas.RoomUpdate,
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.EDIT_ROOMS))
 ):
     """Update room (admin only)"""
-    if not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can update rooms"
-        )
-    
-    room = crud.update_room(db=db, room_id=room_id, room_update=room_update)
+    room = await async_crud.update_room(db=db, room_id=room_id, room_update=room_update)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,19 +109,13 @@ def update_room(
     return room
 
 @router.delete("/{room_id}", response_model=schemas.RoomResponse)
-def delete_room(
+async def delete_room(
     room_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.UserResponse = Depends(require(Permission.DELETE_ROOMS))
 ):
     """Delete room (admin only)"""
-    if not current_user.is_admin:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can delete rooms"
-        )
-    
-    room = crud.delete_room(db=db, room_id=room_id)
+    room = await async_crud.delete_room(db=db, room_id=room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,56 +124,90 @@ def delete_room(
     return room
 
 @router.get("/{room_id}/availability")
-def get_room_availability(
+async def get_room_availability(
     room_id: int,
     date: datetime,
-    db: Session = Depends(get_db)
+    slot_minutes: int = 60,
+    min_duration: int = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get available time slots for a room on a specific date"""
-    room = crud.get_room(db=db, room_id=room_id)
+    """Get available time slots for a room on a specific date
+    
+    With `min_duration` (minutes) returns free windows at least that long.
+    """
+    validate_slot_minutes(slot_minutes)
+    
+    room = await async_crud.get_room(db=db, room_id=room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
     
-    available_slots = crud.get_room_availability(db=db, room_id=room_id, date=date)
+    available_slots = await async_crud.get_room_availability(
+        db=db,
+        room_id=room_id,
+        date=date,
+        slot_minutes=slot_minutes,
+        min_duration=min_duration
+    )
     
     return {
         "room_id": room_id,
         "room_name": room.name,
         "date": date.isoformat(),
+        "slot_minutes": slot_minutes,
         "available_slots": available_slots
     }
 
+@router.get("/{room_id}/events")
+async def get_room_events(room_id: int, date: date = None, db: AsyncSession = Depends(get_read_db)):
+    """Server-Sent Events with slot changes of a room (on `date` or any day)
+    
+    Events: `booked` and `released` with the booking interval, `resync` when
+    the client fell behind and has to re-fetch availability.
+    """
+    room = await async_crud.get_room(db=db, room_id=room_id)
+    if not room:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+    # Сессия зависимости закрывается только после ответа, а поток живет
+    # долго: соединение пула возвращаем сразу
+    await db.close()
+    
+    subscription = booking_events.subscribe(room_id, date)
+    return StreamingResponse(
+        event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{room_id}/bookings", response_model=List[schemas.BookingResponse])
-def get_room_bookings(
+async def get_room_bookings(
     room_id: int,
+    response: Response,
     start_date: datetime = None,
     end_date: datetime = None,
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get bookings for a specific room"""
-    room = crud.get_room(db=db, room_id=room_id)
+    """Get bookings for a specific room in chronological order"""
+    room = await async_crud.get_room(db=db, room_id=room_id)
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
     
-    bookings = crud.get_room_bookings(
+    bookings, next_cursor = await async_crud.get_room_bookings(
         db=db, 
         room_id=room_id, 
         start_date=start_date, 
-        end_date=end_date
+        end_date=end_date,
+        page=page
     )
     
-    # Add user names to booking responses
-    booking_responses = []
-    for booking in bookings:
-        booking_dict = booking.__dict__.copy()
-        booking_dict['user_name'] = booking.user.full_name if booking.user else None
-        booking_dict['room'] = booking.room
-        booking_responses.append(schemas.BookingResponse(**booking_dict))
-    
-    return booking_responses
+    set_next_cursor(response, next_cursor)
+    return [schemas.BookingResponse.from_booking(booking) for booking in bookings]
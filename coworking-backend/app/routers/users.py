@@ -1,33 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from .. import crud, schemas
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_read_db
+from .. import async_crud, schemas
 from ..utils.security import get_current_user
+from ..utils.permissions import is_owner_or_admin
+from ..utils.pagination import PageParams, page_params, set_next_cursor
 
 router = APIRouter()
 
 @router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: schemas.UserResponse = Depends(get_current_user)):
+async def read_users_me(current_user: schemas.UserResponse = Depends(get_current_user)):
     return current_user
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db), 
-            current_user: schemas.UserResponse = Depends(get_current_user)):
-    db_user = crud.get_user(db, user_id=user_id)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db), 
+                  current_user: schemas.UserResponse = Depends(get_current_user)):
+    db_user = await async_crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.get("/{user_id}/visits", response_model=list[schemas.VisitResponse])
-def get_user_visits(user_id: int, db: Session = Depends(get_db),
-                   current_user: schemas.UserResponse = Depends(get_current_user)):
-    if current_user.id != user_id and not current_user.is_admin:
+async def get_user_visits(user_id: int, response: Response, page: PageParams = Depends(page_params),
+                         db: AsyncSession = Depends(get_read_db),
+                         current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_user_visits(db, user_id=user_id)
+    visits, next_cursor = await async_crud.get_user_visits(db, user_id=user_id, page=page)
+    set_next_cursor(response, next_cursor)
+    return visits
 
 @router.get("/{user_id}/donations", response_model=list[schemas.DonationResponse])
-def get_user_donations(user_id: int, db: Session = Depends(get_db),
-                      current_user: schemas.UserResponse = Depends(get_current_user)):
-    if current_user.id != user_id and not current_user.is_admin:
+async def get_user_donations(user_id: int, response: Response, page: PageParams = Depends(page_params),
+                            db: AsyncSession = Depends(get_read_db),
+                            current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_user_donations(db, user_id=user_id)
\ No newline at end of file
+    donations, next_cursor = await async_crud.get_user_donations(db, user_id=user_id, page=page)
+    set_next_cursor(response, next_cursor)
+    return donations
\ No newline at end of file
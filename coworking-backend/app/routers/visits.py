@@ -1,51 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import get_db
-from .. import crud, schemas
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, get_read_db
+from .. import async_crud, schemas
 from ..utils.security import get_current_user
+from ..utils.permissions import Permission, require, is_owner_or_admin
+from ..utils.conditional import conditional
+from ..utils.pagination import PageParams, page_params, set_next_cursor
+from ..utils.checkin_batcher import checkin_batcher, CHECKIN_BATCH_ENABLED
+from ..utils.occupancy import occupancy
 
 router = APIRouter()
 
 @router.post("/check-in", response_model=schemas.VisitResponse)
-def check_in(visit: schemas.VisitCreate, db: Session = Depends(get_db),
-            current_user: schemas.UserResponse = Depends(get_current_user)):
-    if current_user.id != visit.user_id and not current_user.is_admin:
+async def check_in(visit: schemas.VisitCreate, db: AsyncSession = Depends(get_async_db),
+                  current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, visit.user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.create_visit(db=db, visit=visit)
+    if not occupancy.claim(visit.user_id):
+        # Память процесса могла отстать: check-out мог пройти в другом процессе
+        open_visit = await async_crud.get_open_visit(db, user_id=visit.user_id)
+        occupancy.refresh(visit.user_id, open_visit)
+        if open_visit is not None or not occupancy.claim(visit.user_id):
+            raise HTTPException(status_code=409, detail="User is already checked in")
+    try:
+        if CHECKIN_BATCH_ENABLED:
+            return await checkin_batcher.submit(visit)
+        return await async_crud.create_visit(db=db, visit=visit)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    finally:
+        # После записи резерв уже снят в crud; здесь - на случай ошибки
+        occupancy.release(visit.user_id)
+
+@router.get("/occupancy", response_model=schemas.OccupancyResponse)
+async def get_occupancy(db: AsyncSession = Depends(get_read_db),
+                        current_user: schemas.UserResponse = Depends(get_current_user)):
+    await db.run_sync(occupancy.reload_if_stale)
+    return {"headcount": occupancy.headcount}
+
+@router.get("/occupancy/{user_id}", response_model=schemas.VisitStatus)
+async def get_visit_status(user_id: int, db: AsyncSession = Depends(get_read_db),
+                           current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, user_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    await db.run_sync(occupancy.reload_if_stale)
+    entry = occupancy.status(user_id)
+    if entry is None:
+        return {"user_id": user_id, "checked_in": False}
+    return {"user_id": user_id, "checked_in": True, "visit_id": entry[0], "check_in": entry[1]}
 
 @router.post("/{visit_id}/check-out", response_model=schemas.VisitResponse)
-def check_out(visit_id: int, db: Session = Depends(get_db),
-             current_user: schemas.UserResponse = Depends(get_current_user)):
-    visit = crud.check_out_visit(db, visit_id=visit_id)
+async def check_out(visit_id: int, db: AsyncSession = Depends(get_async_db),
+                   current_user: schemas.UserResponse = Depends(get_current_user)):
+    visit = await async_crud.check_out_visit(db, visit_id=visit_id)
     if not visit:
         raise HTTPException(status_code=404, detail="Visit not found")
-    if current_user.id != visit.user_id and not current_user.is_admin:
+    if not is_owner_or_admin(current_user, visit.user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
     return visit
 
 @router.post("/donate", response_model=schemas.DonationResponse)
-def make_donation(donation: schemas.DonationCreate, db: Session = Depends(get_db),
-                 current_user: schemas.UserResponse = Depends(get_current_user)):
-    if current_user.id != donation.user_id and not current_user.is_admin:
+async def make_donation(donation: schemas.DonationCreate, db: AsyncSession = Depends(get_async_db),
+                       current_user: schemas.UserResponse = Depends(get_current_user)):
+    if not is_owner_or_admin(current_user, donation.user_id):
         raise HTTPException(status_code=403, detail="Not authorized")
     if donation.amount < 10:
         raise HTTPException(status_code=400, detail="Minimum donation amount is 10 rubles")
-    return crud.create_donation(db=db, donation=donation)
+    return await async_crud.create_donation(db=db, donation=donation)
 
 @router.get("/donations", response_model=list[schemas.DonationResponse])
-def get_all_donations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                     current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return crud.get_donations(db, skip=skip, limit=limit)
+async def get_all_donations(response: Response, page: PageParams = Depends(page_params),
+                           db: AsyncSession = Depends(get_read_db),
+                           current_user: schemas.UserResponse = Depends(require(Permission.VIEW_ALL_DONATIONS))):
+    donations, next_cursor = await async_crud.get_donations(db, page=page)
+    set_next_cursor(response, next_cursor)
+    return donations
 
 @router.get("/donations/recent", response_model=list[schemas.DonationResponse])
-def get_recent_donations(limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_recent_donations(db, limit=limit)
+async def get_recent_donations(limit: int = 10, db: AsyncSession = Depends(get_read_db),
+                               _: None = Depends(conditional("donations"))):
+    return await async_crud.get_recent_donations(db, limit=limit)
 
 @router.get("/donations/stats")
-def get_donations_stats(days: int = 30, db: Session = Depends(get_db),
-                       current_user: schemas.UserResponse = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return crud.get_donations_stats(db, days=days)
\ No newline at end of file
+async def get_donations_stats(days: int = 30, db: AsyncSession = Depends(get_read_db),
+                             current_user: schemas.UserResponse = Depends(require(Permission.VIEW_STATISTICS))):
+    return await async_crud.get_donations_stats(db, days=days)
\ No newline at end of file
@@ -46,6 +46,15 @@ class VisitResponse(VisitBase):
     class Config:
         from_attributes = True
 
+class OccupancyResponse(BaseModel):
+    headcount: int
+
+class VisitStatus(BaseModel):
+    user_id: int
+    checked_in: bool
+    visit_id: Optional[int] = None
+    check_in: Optional[datetime] = None
+
 class DonationBase(BaseModel):
     amount: float
     message: Optional[str] = None
@@ -86,6 +95,18 @@ class UserStats(BaseModel):
     average_duration: float
     last_visit: Optional[datetime] = None
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    full_name: str
+    score: float
+
+class Leaderboard(BaseModel):
+    metric: str
+    period: str
+    since: Optional[datetime] = None
+    entries: List[LeaderboardEntry]
+
 # Room schemas
 class RoomBase(BaseModel):
     name: str
@@ -139,9 +160,14 @@ class BookingUpdate(BaseModel):
     purpose: Optional[str] = None
     status: Optional[str] = None
 
-class BookingResponse(BookingBase):
+class BookingResponse(BaseModel):
+    # Not derived from BookingBase: past bookings must still be readable
     id: int
+    room_id: int
     user_id: int
+    start_time: datetime
+    end_time: datetime
+    purpose: Optional[str] = None
     status: str
     created_at: datetime
     updated_at: datetime
@@ -151,6 +177,88 @@ class BookingResponse(BookingBase):
     class Config:
         from_attributes = True
 
+    @classmethod
+    def from_booking(cls, booking, user_name: Optional[str] = None, room=None):
+        """Build the response from a Booking whose user and room are already loaded"""
+        room = room if room is not None else booking.room
+        if user_name is None and booking.user is not None:
+            user_name = booking.user.full_name
+        return cls(
+            id=booking.id,
+            room_id=booking.room_id,
+            user_id=booking.user_id,
+            start_time=booking.start_time,
+            end_time=booking.end_time,
+            purpose=booking.purpose,
+            status=booking.status,
+            created_at=booking.created_at,
+            updated_at=booking.updated_at,
+            room=RoomResponse.model_validate(room),
+            user_name=user_name
+        )
+
+# Bulk / recurring bookings
+class BookingOccurrence(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+    @field_validator('end_time')
+    def validate_end_time(cls, v, info):
+        if 'start_time' in info.data and v <= info.data['start_time']:
+            raise ValueError('End time must be after start time')
+        return v
+
+class BookingRecurrence(BaseModel):
+    freq: str  # daily, weekly
+    interval: int = 1
+    until: datetime
+
+    @field_validator('freq')
+    def validate_freq(cls, v):
+        if v not in ('daily', 'weekly'):
+            raise ValueError('freq must be daily or weekly')
+        return v
+
+    @field_validator('interval')
+    def validate_interval(cls, v):
+        if v < 1:
+            raise ValueError('interval must be positive')
+        return v
+
+class BookingBulkCreate(BaseModel):
+    """Either an explicit list of occurrences or a first occurrence plus recurrence"""
+    room_id: int
+    purpose: Optional[str] = None
+    occurrences: Optional[List[BookingOccurrence]] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    recurrence: Optional[BookingRecurrence] = None
+
+    @field_validator('end_time')
+    def validate_end_time(cls, v, info):
+        if v is not None and info.data.get('start_time') is not None and v <= info.data['start_time']:
+            raise ValueError('End time must be after start time')
+        return v
+
+    @field_validator('recurrence')
+    def validate_recurrence(cls, v, info):
+        if v is not None and (info.data.get('start_time') is None or info.data.get('end_time') is None):
+            raise ValueError('start_time and end_time are required with recurrence')
+        return v
+
+class BookingOccurrenceResult(BaseModel):
+    # Без проверок BookingOccurrence: отклоненные интервалы тоже попадают в ответ
+    start_time: datetime
+    end_time: datetime
+    status: str  # created, conflict, invalid, limit
+    booking_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BookingBulkResponse(BaseModel):
+    room_id: int
+    created: int
+    occurrences: List[BookingOccurrenceResult]
+
 class BookingAvailability(BaseModel):
     room_id: int
     room_name: str
@@ -0,0 +1,72 @@
+"""
+Битовые маски занятости аудиторий: бит i соответствует i-му слоту рабочего дня
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Рабочие часы, как в permissions.validate_booking_time
+OPEN_HOUR = 9
+CLOSE_HOUR = 21
+
+# Допустимая длина слота: делит час без остатка
+ALLOWED_SLOT_MINUTES = (15, 30, 60)
+
+def slot_count(slot_minutes: int = 60) -> int:
+    return (CLOSE_HOUR - OPEN_HOUR) * 60 // slot_minutes
+
+def slot_labels(slot_minutes: int = 60) -> List[str]:
+    start = datetime(2000, 1, 1, OPEN_HOUR)
+    return [
+        (start + timedelta(minutes=i * slot_minutes)).strftime("%H:%M")
+        for i in range(slot_count(slot_minutes))
+    ]
+
+def busy_mask(intervals: Iterable[Tuple[datetime, datetime]], day: datetime,
+              slot_minutes: int = 60) -> int:
+    """Маска слотов дня `day`, пересекающихся хотя бы с одним интервалом"""
+    opening = day.replace(hour=OPEN_HOUR, minute=0, second=0, microsecond=0)
+    slots = slot_count(slot_minutes)
+    step = slot_minutes * 60
+    mask = 0
+    for start, end in intervals:
+        first = max(0, int((start - opening).total_seconds() // step))
+        last = min(slots, -int(-(end - opening).total_seconds() // step))
+        if first < last:
+            mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+def full_mask(slot_minutes: int = 60) -> int:
+    return (1 << slot_count(slot_minutes)) - 1
+
+def slot_start(day: datetime, index: int, slot_minutes: int = 60) -> datetime:
+    opening = day.replace(hour=OPEN_HOUR, minute=0, second=0, microsecond=0)
+    return opening + timedelta(minutes=index * slot_minutes)
+
+def free_runs(free: int, min_slots: int = 1) -> List[Tuple[int, int]]:
+    """Непрерывные серии единичных битов (first, length) длиной не меньше min_slots"""
+    runs = []
+    while free:
+        first = (free & -free).bit_length() - 1
+        shifted = free >> first
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        if length >= min_slots:
+            runs.append((first, length))
+        free &= ~(((1 << length) - 1) << first)
+    return runs
+
+def parse_equipment(equipment: Optional[str]) -> Set[str]:
+    """Оборудование хранится JSON-списком или строкой через запятую"""
+    if not equipment:
+        return set()
+    try:
+        items = json.loads(equipment)
+        if not isinstance(items, list):
+            items = [items]
+    except ValueError:
+        items = equipment.split(",")
+    return {str(item).strip().lower() for item in items if str(item).strip()}
+
+def has_equipment(room_equipment: Optional[str], required: Set[str]) -> bool:
+    return not required or required <= parse_equipment(room_equipment)
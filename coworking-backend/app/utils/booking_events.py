@@ -0,0 +1,214 @@
+"""
+Рассылка изменений занятости аудиторий подписчикам (Server-Sent Events).
+
+crud после commit бронирования публикует события:
+- booked - интервал занят (create_booking, create_bookings_bulk, update_booking);
+- released - интервал освободился (cancel_booking, update_booking).
+Изменение бронирования - это released старого интервала и booked нового.
+
+Подписка оформляется на аудиторию и дату (или на все даты аудитории), у
+каждого подписчика своя ограниченная очередь (BOOKING_EVENTS_QUEUE). Если
+клиент не успевает читать и очередь переполнена, накопленное отбрасывается
+и приходит одно событие resync - клиенту нужно заново запросить
+/availability.
+
+Брокер выбирается переменной BOOKING_EVENTS_BROKER:
+- memory (по умолчанию) - события доходят только до подписчиков этого процесса;
+- redis - события публикуются в канал Redis (адрес BOOKING_EVENTS_URL, нужен
+  пакет redis), каждый процесс слушает канал и раздает их своим подписчикам.
+  Нужен при нескольких процессах uvicorn/gunicorn.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+BOOKING_EVENTS_BROKER = os.getenv("BOOKING_EVENTS_BROKER", "memory")
+BOOKING_EVENTS_URL = os.getenv("BOOKING_EVENTS_URL", "redis://localhost:6379/0")
+BOOKING_EVENTS_QUEUE = int(os.getenv("BOOKING_EVENTS_QUEUE", 100))
+BOOKING_EVENTS_HEARTBEAT = float(os.getenv("BOOKING_EVENTS_HEARTBEAT", 15))
+BOOKING_EVENTS_CHANNEL = "coworking:booking-events"
+
+class InProcessBroker:
+    """События передаются подписчикам этого же процесса"""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def stop(self):
+        pass
+
+    def publish(self, event: dict):
+        self._deliver(event)
+
+class RedisBroker:
+    """Канал Redis; события доставляются через него и в своем процессе"""
+
+    def __init__(self, client, channel: str = BOOKING_EVENTS_CHANNEL):
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, deliver):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: lambda message: deliver(json.loads(message["data"]))})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def publish(self, event: dict):
+        self.client.publish(self.channel, json.dumps(event))
+
+def create_broker(name: str = BOOKING_EVENTS_BROKER):
+    if name == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("BOOKING_EVENTS_BROKER=redis requires the 'redis' package")
+        return RedisBroker(redis.Redis.from_url(BOOKING_EVENTS_URL))
+    return InProcessBroker()
+
+# Ключ подписки: (room_id, дата в ISO) или (room_id, None) - все даты
+SubscriptionKey = Tuple[int, Optional[str]]
+
+class Subscription:
+    def __init__(self, key: SubscriptionKey, max_queue: int):
+        self.key = key
+        self.queue: "asyncio.Queue" = asyncio.Queue(max_queue)
+
+    def put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "room_id": self.key[0], "date": self.key[1]})
+
+class BookingEvents:
+    def __init__(self, broker=None, max_queue: int = BOOKING_EVENTS_QUEUE):
+        self.broker = broker if broker is not None else InProcessBroker()
+        self.max_queue = max_queue
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[SubscriptionKey, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def start(self):
+        """Вызывается в цикле событий сервера; до start публикация ничего не делает"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self.broker.start(self._deliver)
+
+    def stop(self):
+        if self._loop is not None:
+            self.broker.stop()
+            self._loop = None
+
+    def subscribe(self, room_id: int, day: Optional[date] = None) -> Subscription:
+        """Только из цикла событий сервера"""
+        subscription = Subscription((room_id, day.isoformat() if day else None), self.max_queue)
+        self._subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    def booked(self, booking_id: int, room_id: int, start_time: datetime, end_time: datetime):
+        self._publish("booked", booking_id, room_id, start_time, end_time)
+
+    def released(self, booking_id: int, room_id: int, start_time: datetime, end_time: datetime):
+        self._publish("released", booking_id, room_id, start_time, end_time)
+
+    def resync(self):
+        """Всем подписчикам: состояние неизвестно, нужно перечитать занятость"""
+        if self._loop is not None:
+            self._send({"type": "resync", "room_id": None, "date": None})
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "running": self.running,
+            "subscriptions": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "failed": self.failed,
+        }
+
+    def _publish(self, kind: str, booking_id: int, room_id: int, start_time: datetime, end_time: datetime):
+        # Вызывается из потоков crud (пул, поток-писатель) после commit
+        if self._loop is None:
+            return
+        day = start_time.date()
+        last_day = (end_time - timedelta(microseconds=1)).date()
+        while day <= last_day:
+            self._send({
+                "type": kind,
+                "booking_id": booking_id,
+                "room_id": room_id,
+                "date": day.isoformat(),
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+            })
+            day += timedelta(days=1)
+
+    def _send(self, event: dict):
+        # Бронирование уже записано: недоступный брокер не должен ломать запрос
+        try:
+            self.broker.publish(event)
+            self.published += 1
+        except Exception:
+            self.failed += 1
+
+    def _deliver(self, event: dict):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: dict):
+        if event["room_id"] is None:
+            for subscribers in self._subscribers.values():
+                for subscription in subscribers:
+                    subscription.put({**event, "room_id": subscription.key[0], "date": subscription.key[1]})
+                    self.delivered += 1
+            return
+        for key in ((event["room_id"], event["date"]), (event["room_id"], None)):
+            for subscription in self._subscribers.get(key, ()):
+                subscription.put(event)
+                self.delivered += 1
+
+booking_events = BookingEvents(create_broker())
+
+async def event_stream(subscription: Subscription, heartbeat: float = BOOKING_EVENTS_HEARTBEAT):
+    """Тело ответа text/event-stream; подписка снимается при отключении клиента"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Комментарий SSE: не дает прокси закрыть простаивающее соединение
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        booking_events.unsubscribe(subscription)
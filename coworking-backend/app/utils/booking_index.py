@@ -0,0 +1,167 @@
+"""
+Индекс подтвержденных бронирований в памяти процесса
+
+Свои записи процесс применяет к индексу сразу после commit, а записи других
+процессов (второй воркер uvicorn, скрипты) индекс не видит. Поэтому чтение
+занятости доверяет индексу не дольше BOOKING_INDEX_MAX_AGE секунд после
+загрузки, потом индекс перечитывается из базы (RoomIntervalIndex.fresh).
+BOOKING_INDEX_MAX_AGE=0 - занятость всегда читается из базы.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+BOOKING_INDEX_MAX_AGE = float(os.getenv("BOOKING_INDEX_MAX_AGE", 5))
+
+class RoomIntervalIndex:
+    """
+    Отсортированные по началу интервалы подтвержденных бронирований каждой
+    аудитории. Подтвержденные бронирования одной аудитории не пересекаются,
+    поэтому концы интервалов тоже отсортированы и поиск пересечений занимает
+    O(log n + k).
+
+    Индекс - быстрая предварительная проверка: при записи конфликт все равно
+    перепроверяется в базе внутри транзакции (см. crud.create_booking).
+    """
+
+    def __init__(self, max_age: float = BOOKING_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._loaded_at = 0.0
+        self.reloads = 0
+        self._starts: Dict[int, List[datetime]] = {}
+        self._intervals: Dict[int, List[Tuple[datetime, datetime, int]]] = {}
+        self._by_id: Dict[int, Tuple[int, datetime, datetime]] = {}
+        # Бронирования, закончившиеся раньше horizon, в индекс не загружаются
+        self.horizon: Optional[datetime] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.horizon is not None
+
+    def covers(self, start: datetime) -> bool:
+        return self.loaded and start >= self.horizon
+
+    def fresh(self, db: Session, start: datetime) -> bool:
+        """
+        Можно ли ответить о занятости начиная со start по индексу: индекс
+        покрывает start и загружен не раньше max_age секунд назад (иначе
+        перечитывается из db)
+        """
+        if not self.covers(start) or self.max_age <= 0:
+            return False
+        if time.monotonic() - self._loaded_at > self.max_age:
+            with self._reload_lock:
+                if time.monotonic() - self._loaded_at > self.max_age:
+                    self.load(db)
+                    self.reloads += 1
+        return self.covers(start)
+
+    def load(self, db: Session):
+        horizon = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        bookings = db.query(
+            models.Booking.id, models.Booking.room_id,
+            models.Booking.start_time, models.Booking.end_time
+        ).filter(
+            models.Booking.status == "confirmed",
+            models.Booking.end_time > horizon
+        ).order_by(models.Booking.room_id, models.Booking.start_time).all()
+
+        with self._lock:
+            self._starts.clear()
+            self._intervals.clear()
+            self._by_id.clear()
+            for booking_id, room_id, start_time, end_time in bookings:
+                self._insert(room_id, start_time, end_time, booking_id)
+            self.horizon = horizon
+            self._loaded_at = time.monotonic()
+
+    def reload_room(self, db: Session, room_id: int):
+        bookings = db.query(
+            models.Booking.id, models.Booking.start_time, models.Booking.end_time
+        ).filter(
+            models.Booking.room_id == room_id,
+            models.Booking.status == "confirmed",
+            models.Booking.end_time > self.horizon
+        ).all()
+
+        with self._lock:
+            for booking_id in [i for i, (r, _, _) in self._by_id.items() if r == room_id]:
+                self._delete(booking_id)
+            for booking_id, start_time, end_time in bookings:
+                self._insert(room_id, start_time, end_time, booking_id)
+
+    def put(self, booking: models.Booking):
+        """Добавляет или обновляет бронирование; неподтвержденные удаляются"""
+        if booking.status == "confirmed":
+            self.add(booking.id, booking.room_id, booking.start_time, booking.end_time)
+        else:
+            self.remove(booking.id)
+
+    def add(self, booking_id: int, room_id: int, start_time: datetime, end_time: datetime):
+        """Добавляет (или переносит) подтвержденное бронирование"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._delete(booking_id)
+            if end_time > self.horizon:
+                self._insert(room_id, start_time, end_time, booking_id)
+
+    def remove(self, booking_id: int):
+        with self._lock:
+            self._delete(booking_id)
+
+    def overlapping(self, room_id: int, start: datetime, end: datetime,
+                    exclude_id: int = None) -> List[Tuple[datetime, datetime, int]]:
+        """Интервалы (start, end, booking_id), пересекающие [start, end), по порядку"""
+        with self._lock:
+            starts = self._starts.get(room_id)
+            if not starts:
+                return []
+            intervals = self._intervals[room_id]
+            result = []
+            i = bisect_left(starts, end) - 1
+            while i >= 0 and intervals[i][1] > start:
+                if intervals[i][2] != exclude_id:
+                    result.append(intervals[i])
+                i -= 1
+            result.reverse()
+            return result
+
+    def find_conflict(self, room_id: int, start: datetime, end: datetime,
+                      exclude_id: int = None) -> Optional[int]:
+        conflicts = self.overlapping(room_id, start, end, exclude_id)
+        return conflicts[0][2] if conflicts else None
+
+    def _insert(self, room_id, start_time, end_time, booking_id):
+        starts = self._starts.setdefault(room_id, [])
+        intervals = self._intervals.setdefault(room_id, [])
+        i = bisect_right(starts, start_time)
+        starts.insert(i, start_time)
+        intervals.insert(i, (start_time, end_time, booking_id))
+        self._by_id[booking_id] = (room_id, start_time, end_time)
+
+    def _delete(self, booking_id):
+        entry = self._by_id.pop(booking_id, None)
+        if entry is None:
+            return
+        room_id, start_time, _ = entry
+        starts = self._starts[room_id]
+        intervals = self._intervals[room_id]
+        i = bisect_left(starts, start_time)
+        while i < len(intervals) and intervals[i][2] != booking_id:
+            i += 1
+        if i < len(intervals):
+            del starts[i]
+            del intervals[i]
+
+booking_index = RoomIntervalIndex()
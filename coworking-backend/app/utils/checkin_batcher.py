@@ -0,0 +1,106 @@
+"""
+Пакетная запись check-in в часы пик (write-behind).
+
+Включается переменной CHECKIN_BATCH_ENABLED=1. Запросы POST /visits/check-in
+складываются в очередь и записываются одной транзакцией через
+crud.create_visits_batch: многострочный INSERT, карма и агрегаты - один
+commit на пакет. Пакет уходит, когда в очереди CHECKIN_BATCH_SIZE запросов
+или через CHECKIN_BATCH_MS миллисекунд после первого запроса. Каждый
+вызывающий ждет свой future и получает уже сохраненное посещение с id.
+
+Пакеты пишутся по одному: пока идет запись, следующий пакет набирается.
+Если пакет не записался целиком (например, из-за несуществующего
+пользователя), запросы повторяются по одному через crud.create_visit, и
+ошибку получает только тот запрос, который ее вызвал.
+"""
+
+import asyncio
+import os
+from typing import List, Optional, Set, Tuple
+
+from .. import crud, models, schemas
+from ..database import AsyncSessionLocal
+from .write_queue import run_write
+
+CHECKIN_BATCH_ENABLED = os.getenv("CHECKIN_BATCH_ENABLED", "0") == "1"
+CHECKIN_BATCH_MS = float(os.getenv("CHECKIN_BATCH_MS", 20))
+CHECKIN_BATCH_SIZE = int(os.getenv("CHECKIN_BATCH_SIZE", 100))
+
+class CheckInBatcher:
+    def __init__(self, delay_ms: float = CHECKIN_BATCH_MS, max_items: int = CHECKIN_BATCH_SIZE):
+        self.delay = delay_ms / 1000
+        self.max_items = max_items
+        self._pending: List[Tuple[schemas.VisitCreate, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._write_lock: Optional[asyncio.Lock] = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, visit: schemas.VisitCreate) -> models.Visit:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((visit, future))
+        if len(self._pending) >= self.max_items:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._start_flush)
+        return await future
+
+    async def drain(self):
+        """Записывает очередь и ждет незавершенные пакеты (при остановке)"""
+        self._start_flush()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CHECKIN_BATCH_ENABLED,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch": self.items / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch):
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            async with AsyncSessionLocal() as db:
+                try:
+                    visits = await run_write(db, crud.create_visits_batch, [visit for visit, _ in batch])
+                except Exception:
+                    await db.rollback()
+                    await self._flush_one_by_one(db, batch)
+                    return
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), visit in zip(batch, visits):
+                if not future.done():
+                    future.set_result(visit)
+
+    async def _flush_one_by_one(self, db, batch):
+        for visit, future in batch:
+            try:
+                result = await run_write(db, crud.create_visit, visit)
+            except Exception as exc:
+                await db.rollback()
+                if not future.done():
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.items += 1
+            if not future.done():
+                future.set_result(result)
+
+checkin_batcher = CheckInBatcher()
@@ -0,0 +1,87 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) по версиям ресурсов.
+
+crud увеличивает версию ресурса (таблица resource_versions) в той же
+транзакции, что и само изменение (crud.bump_resource_version), поэтому
+версия общая для всех процессов сервера. Зависимость conditional(resource)
+читает версию одним запросом по первичному ключу и сравнивает If-None-Match
+(или If-Modified-Since) до выполнения обработчика: при совпадении ответ 304
+отдается без основного запроса и сериализации.
+
+ETag строится из версии и времени изменения, поэтому две записи подряд
+всегда дают разные ETag. Last-Modified имеет точность в секунду, поэтому
+отдается только когда секунда последнего изменения уже прошла, а
+If-Modified-Since из будущего игнорируется: иначе вторая запись в ту же
+секунду могла бы получить 304 со старым телом.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import async_crud
+from ..database import get_read_db
+
+def make_etag(resource: str, version: int, updated_at, variant: str) -> str:
+    digest = hashlib.blake2s(f"{updated_at}|{variant}".encode(), digest_size=6).hexdigest()
+    return f'W/"{resource}-{version}-{digest}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    # Слабое сравнение: W/"x" и "x" считаются совпадающими
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+def _modified_since(updated_at: datetime, header: str, now: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return True
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # Дата из будущего не гарантирует, что позже в ту же секунду не будет записи
+    return since > now or updated_at > since
+
+def conditional(resource: str):
+    """
+    Зависимость для GET-обработчиков ресурса `resource` (rooms - каталог и
+    карточки аудиторий, donations - ленты пожертвований):
+
+        current_user = Depends(...),
+        version: int = Depends(conditional("rooms"))
+
+    Ставить после проверки прав, чтобы 304 не отдавался без авторизации.
+    Возвращает версию, под которой выдан ETag: тело из read_cache нужно
+    брать под этой же версией (async_crud.get_room(..., version=version)).
+    """
+    async def check_not_modified(request: Request, response: Response,
+                                 db: AsyncSession = Depends(get_read_db)):
+        version, updated_at = await async_crud.get_resource_version(db, resource) or (0, None)
+        now = datetime.utcnow()
+        headers = {
+            "ETag": make_etag(resource, version, updated_at, str(request.url.path) + "?" + request.url.query),
+            "Cache-Control": "no-cache",
+        }
+        if updated_at is not None:
+            # Начало следующей секунды после изменения
+            last_modified = updated_at.replace(microsecond=0) + timedelta(seconds=1 if updated_at.microsecond else 0)
+            if last_modified <= now:
+                headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, headers["ETag"])
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = bool(if_modified_since) and updated_at is not None and not _modified_since(
+                updated_at, if_modified_since, now
+            )
+
+        if not_modified:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return version
+
+    return check_not_modified
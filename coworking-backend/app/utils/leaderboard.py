@@ -0,0 +1,215 @@
+"""
+Рейтинги пользователей по карме, сумме пожертвований и посещениям.
+
+Рейтинги хранятся в памяти процесса: при старте они один раз строятся из
+базы (Leaderboards.load), дальше обновляются событиями сессии после commit -
+по новым строкам karma_events, donations и visits. Чтение рейтинга не
+обращается к базе.
+
+Периоды: all (за все время), month (с начала календарного месяца) и week
+(с понедельника), по UTC. Когда начинается новый период, рейтинг за него
+начинается с нуля. Анонимные пожертвования в рейтинг не попадают.
+
+Рейтинги у каждого процесса свои, и изменения из другого процесса (второй
+воркер, reconcile_karma.py) событиями не приходят. Поэтому каждые
+LEADERBOARD_REFRESH_INTERVAL секунд (0 - выключено) рейтинги заново строятся
+из базы в фоне: расхождение между процессами живет не дольше интервала.
+"""
+
+import asyncio
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from .write_queue import after_commit
+
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 60))
+
+METRICS = ("karma", "donated", "visits")
+PERIODS = ("all", "month", "week")
+
+def period_start(period: str, now: datetime) -> Optional[datetime]:
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return day.replace(day=1)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return None
+
+class Ranking:
+    """
+    Очки пользователей и отсортированный список (-score, user_id) тех, у
+    кого очков больше нуля. Обновление - O(log n) поиск и сдвиг списка,
+    первые N мест - срез списка.
+    """
+
+    def __init__(self, since: Optional[datetime] = None):
+        self.since = since
+        self._scores: Dict[int, float] = {}
+        self._ranked: List[Tuple[float, int]] = []
+
+    def add(self, user_id: int, delta: float):
+        if not delta:
+            return
+        old = self._scores.get(user_id, 0)
+        new = old + delta
+        if old > 0:
+            del self._ranked[bisect_left(self._ranked, (-old, user_id))]
+        if new > 0:
+            insort(self._ranked, (-new, user_id))
+        if new:
+            self._scores[user_id] = new
+        else:
+            self._scores.pop(user_id, None)
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        return [(user_id, -score) for score, user_id in self._ranked[:limit]]
+
+class Leaderboards:
+    def __init__(self, refresh_interval: float = LEADERBOARD_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rankings: Dict[Tuple[str, str], Ranking] = {}
+        self._names: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+
+    def load(self, db: Session, now: datetime = None):
+        now = now or datetime.utcnow()
+        rankings = {}
+        for period in PERIODS:
+            since = period_start(period, now)
+            for metric in METRICS:
+                ranking = rankings[(metric, period)] = Ranking(since)
+                for user_id, score in self._scores_query(db, metric, since):
+                    ranking.add(user_id, score or 0)
+        names = dict(db.query(models.User.id, models.User.full_name).all())
+
+        with self._lock:
+            self._rankings = rankings
+            self._names = names
+            self.loaded = True
+
+    def refresh(self):
+        """Перестроить рейтинги из базы (в вызывающем потоке)"""
+        db = SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def start(self):
+        if self.refresh_interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                # База недоступна: остаются прежние рейтинги, повтор через интервал
+                pass
+
+    def _scores_query(self, db: Session, metric: str, since: Optional[datetime]):
+        if metric == "karma":
+            if since is None:
+                return db.query(models.User.id, models.User.karma)
+            return db.query(
+                models.KarmaEvent.user_id, func.sum(models.KarmaEvent.delta)
+            ).filter(
+                models.KarmaEvent.created_at >= since,
+                models.KarmaEvent.reason != "opening_balance"
+            ).group_by(models.KarmaEvent.user_id)
+        if metric == "donated":
+            query = db.query(
+                models.Donation.user_id, func.sum(models.Donation.amount)
+            ).filter(models.Donation.is_anonymous.isnot(True))
+            if since is not None:
+                query = query.filter(models.Donation.donation_date >= since)
+            return query.group_by(models.Donation.user_id)
+        query = db.query(models.Visit.user_id, func.count(models.Visit.id))
+        if since is not None:
+            query = query.filter(models.Visit.check_in >= since)
+        return query.group_by(models.Visit.user_id)
+
+    def apply(self, changes: List[tuple]):
+        """changes - кортежи ("name", user_id, full_name) и (metric, user_id, delta, время)"""
+        now = datetime.utcnow()
+        with self._lock:
+            if not self.loaded:
+                return
+            for change in changes:
+                if change[0] == "name":
+                    self._names[change[1]] = change[2]
+                    continue
+                metric, user_id, delta, at = change
+                for period in PERIODS:
+                    ranking = self._current(metric, period, now)
+                    if ranking.since is None or (at or now) >= ranking.since:
+                        ranking.add(user_id, delta)
+
+    def top(self, metric: str, period: str = "all", limit: int = 10) -> dict:
+        with self._lock:
+            ranking = self._current(metric, period, datetime.utcnow())
+            entries = [
+                {"rank": rank, "user_id": user_id, "full_name": self._names.get(user_id, ""), "score": score}
+                for rank, (user_id, score) in enumerate(ranking.top(limit), start=1)
+            ]
+            return {"metric": metric, "period": period, "since": ranking.since, "entries": entries}
+
+    def _current(self, metric: str, period: str, now: datetime) -> Ranking:
+        ranking = self._rankings[(metric, period)]
+        since = period_start(period, now)
+        if since != ranking.since:
+            ranking = self._rankings[(metric, period)] = Ranking(since)
+        return ranking
+
+leaderboards = Leaderboards()
+
+# Изменения копятся в session.info после flush и применяются к рейтингам
+# только после commit, как инвалидация в principal_cache
+
+PENDING_CHANGES_KEY = "leaderboard_pending_changes"
+
+@event.listens_for(Session, "after_flush")
+def _collect_leaderboard_changes(session, flush_context):
+    changes = session.info.setdefault(PENDING_CHANGES_KEY, [])
+    for instance in session.new:
+        if isinstance(instance, models.KarmaEvent):
+            changes.append(("karma", instance.user_id, instance.delta, instance.created_at))
+        elif isinstance(instance, models.Donation) and not instance.is_anonymous:
+            changes.append(("donated", instance.user_id, instance.amount, instance.donation_date))
+        elif isinstance(instance, models.Visit):
+            changes.append(("visits", instance.user_id, 1, instance.check_in))
+        elif isinstance(instance, models.User):
+            changes.append(("name", instance.id, instance.full_name))
+    for instance in session.dirty:
+        if isinstance(instance, models.User) and session.is_modified(instance):
+            changes.append(("name", instance.id, instance.full_name))
+
+@event.listens_for(Session, "after_commit")
+def _apply_leaderboard_changes(session):
+    changes = session.info.pop(PENDING_CHANGES_KEY, None)
+    if changes:
+        after_commit(leaderboards.apply, changes)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_leaderboard_changes(session):
+    session.info.pop(PENDING_CHANGES_KEY, None)
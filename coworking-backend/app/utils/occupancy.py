@@ -0,0 +1,118 @@
+"""
+Текущая заполненность коворкинга: открытые посещения в памяти процесса
+
+Check-in и check-out других процессов (второй воркер, sweeper другого
+процесса) память не видит, поэтому число присутствующих и статус
+пользователя отдаются по памяти не дольше OCCUPANCY_MAX_AGE секунд после
+загрузки, потом она перечитывается из базы (Occupancy.reload_if_stale).
+Повторный check-in окончательно отклоняет уникальный частичный индекс
+ix_visits_open_user.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+OCCUPANCY_MAX_AGE = float(os.getenv("OCCUPANCY_MAX_AGE", 5))
+
+class Occupancy:
+    """
+    Открытое посещение (visit_id, check_in) каждого пользователя, который
+    сейчас в коворкинге. Строится из базы при старте (load) и обновляется
+    crud.create_visit / crud.check_out_visit после commit, поэтому число
+    присутствующих и статус пользователя отдаются за O(1) без запросов.
+
+    claim резервирует пользователя на время записи check-in: повторный
+    check-in этого процесса отклоняется, в том числе если первый еще не
+    записан. Как и booking_index, состояние у каждого процесса свое, поэтому
+    отказ claim перепроверяется запросом к базе (refresh): check-out мог
+    пройти в другом процессе. Check-in другого процесса claim не видит -
+    такой повтор отклоняет база (ix_visits_open_user уникален).
+    """
+
+    def __init__(self, max_age: float = OCCUPANCY_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._open: Dict[int, Tuple[int, datetime]] = {}
+        self._claimed: Set[int] = set()
+        self._loaded_at = 0.0
+        self.loaded = False
+
+    def load(self, db: Session):
+        # Частичный индекс ix_visits_open_user: читаются только открытые посещения
+        visits = db.query(
+            models.Visit.user_id, models.Visit.id, models.Visit.check_in
+        ).filter(
+            models.Visit.check_out.is_(None)
+        ).order_by(models.Visit.user_id).all()
+
+        with self._lock:
+            # Резервы claim не сбрасываются: их check-in еще записываются
+            self._open = {user_id: (visit_id, check_in) for user_id, visit_id, check_in in visits}
+            self._loaded_at = time.monotonic()
+            self.loaded = True
+
+    def reload_if_stale(self, db: Session):
+        """Перечитывает открытые посещения, если память старше max_age секунд"""
+        if not self.loaded or time.monotonic() - self._loaded_at <= self.max_age:
+            return
+        with self._reload_lock:
+            if time.monotonic() - self._loaded_at > self.max_age:
+                self.load(db)
+
+    @property
+    def headcount(self) -> int:
+        return len(self._open)
+
+    def status(self, user_id: int) -> Optional[Tuple[int, datetime]]:
+        return self._open.get(user_id)
+
+    def claim(self, user_id: int) -> bool:
+        """False, если пользователь уже в коворкинге или его check-in записывается"""
+        if not self.loaded:
+            return True
+        with self._lock:
+            if user_id in self._open or user_id in self._claimed:
+                return False
+            self._claimed.add(user_id)
+            return True
+
+    def refresh(self, user_id: int, visit: Optional[models.Visit]):
+        """Заменяет запись пользователя открытым посещением из базы (или удаляет ее)"""
+        if not self.loaded:
+            return
+        with self._lock:
+            if visit is None:
+                self._open.pop(user_id, None)
+            else:
+                self._open[user_id] = (visit.id, visit.check_in)
+
+    def release(self, user_id: int):
+        """Снимает резерв claim, если check-in не записался"""
+        with self._lock:
+            self._claimed.discard(user_id)
+
+    def checked_in(self, visit: models.Visit):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._claimed.discard(visit.user_id)
+            self._open[visit.user_id] = (visit.id, visit.check_in)
+
+    def checked_out(self, visit: models.Visit):
+        self.remove(visit.user_id, visit.id)
+
+    def remove(self, user_id: int, visit_id: int):
+        with self._lock:
+            entry = self._open.get(user_id)
+            if entry is not None and entry[0] == visit_id:
+                del self._open[user_id]
+
+occupancy = Occupancy()
@@ -0,0 +1,90 @@
+"""
+Keyset-пагинация по паре (ключ сортировки, id) с непрозрачным курсором.
+
+Следующая страница выбирается условием "после последней строки" вместо
+OFFSET, поэтому стоимость запроса не зависит от глубины страницы.
+Курсор следующей страницы возвращается в заголовке X-Next-Cursor,
+тело ответа остается списком.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import literal, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        if not isinstance(row_id, int):
+            raise ValueError(row_id)
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    return value, row_id
+
+@dataclass
+class PageParams:
+    limit: int = DEFAULT_PAGE_SIZE
+    after: Optional[Tuple[Any, int]] = None
+
+def page_params(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+) -> PageParams:
+    """Зависимость FastAPI: размер страницы и декодированный курсор"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return PageParams(limit=limit, after=after)
+
+def keyset_page(query, sort_column, id_column, page: PageParams, descending: bool = True):
+    """
+    Возвращает (строки, курсор следующей страницы или None).
+    Строки упорядочены по (sort_column, id_column); если это один и тот же
+    столбец, сортировка идет только по id.
+    """
+    single = sort_column is id_column
+    if page.after is not None:
+        value, row_id = page.after
+        if single:
+            query = query.filter(id_column < row_id if descending else id_column > row_id)
+        else:
+            # Сравнение кортежей, а не OR: так SQLite и PostgreSQL начинают
+            # чтение индекса (sort_column, id) сразу с нужной позиции
+            key = tuple_(sort_column, id_column)
+            after = tuple_(literal(value, sort_column.type), literal(row_id, id_column.type))
+            query = query.filter(key < after if descending else key > after)
+    
+    columns = [id_column] if single else [sort_column, id_column]
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    rows = query.limit(page.limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
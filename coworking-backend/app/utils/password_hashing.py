@@ -0,0 +1,92 @@
+"""
+Хеширование и проверка паролей bcrypt в отдельном пуле процессов.
+
+bcrypt занимает сотни миллисекунд CPU на вызов. В пуле процессов он не
+держит GIL и потоки сервера, а очередь ограничена: при всплеске входов
+лишние запросы сразу получают отказ (PasswordHasherBusy -> 503), а не
+копятся без предела.
+
+Стоимость задается BCRYPT_ROUNDS. Хеши с другой стоимостью при успешном
+входе пересчитываются (verify_and_update).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# 0 - без пула процессов, в пуле потоков event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Сколько запросов может ждать свободный процесс
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 64))
+
+# min/max_rounds равны BCRYPT_ROUNDS: хеш с любой другой стоимостью
+# считается устаревшим и пересчитывается при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(пароль верный, новый хеш или None, если пересчет не нужен)"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+    
+    def start(self):
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+    
+    def warm_up(self):
+        """
+        Запускает процессы пула при старте приложения: первый вход не ждет
+        их создания, а fork происходит до появления рабочих потоков сервера
+        """
+        self.start()
+        if self._executor is not None:
+            for future in [self._executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def _run(self, func, *args):
+        # Счетчик меняется только в потоке event loop, блокировка не нужна
+        if self._in_flight >= max(self.workers, 1) + self.queue_size:
+            raise PasswordHasherBusy()
+        self._in_flight += 1
+        try:
+            self.start()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+    
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update, password, hashed_password)
+
+password_hasher = PasswordHasher()
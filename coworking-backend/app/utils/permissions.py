@@ -2,10 +2,12 @@
 Модуль для управления правами доступа и ролевой моделью
 """
 
-from fastapi import HTTPException, status
+from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Iterable, Optional, List
 from enum import Enum
+from functools import wraps
+import inspect
 
 from ..models import User
 from ..schemas import UserResponse
@@ -69,6 +71,41 @@ class Permission(str, Enum):
     SYSTEM_SETTINGS = "admin:system_settings"
     EXPORT_DATA = "admin:export_data"
 
+# Права обычного пользователя (администратор получает их все)
+_USER_PERMISSIONS = [
+    # Аутентификация
+    Permission.LOGIN,
+    Permission.LOGOUT,
+    
+    # Управление профилем
+    Permission.VIEW_OWN_PROFILE,
+    Permission.EDIT_OWN_PROFILE,
+    
+    # Аудитории
+    Permission.VIEW_ROOMS,
+    
+    # Бронирования
+    Permission.CREATE_BOOKINGS,
+    Permission.VIEW_OWN_BOOKINGS,
+    Permission.EDIT_OWN_BOOKINGS,
+    Permission.CANCEL_OWN_BOOKINGS,
+    
+    # Посещения
+    Permission.CHECK_IN,
+    Permission.CHECK_OUT,
+    Permission.VIEW_OWN_VISITS,
+    
+    # Пожертвования
+    Permission.CREATE_DONATIONS,
+    Permission.VIEW_OWN_DONATIONS,
+    
+    # Сообщество
+    Permission.VIEW_POSTS,
+    Permission.CREATE_POSTS,
+    Permission.EDIT_OWN_POSTS,
+    Permission.DELETE_OWN_POSTS,
+]
+
 # Матрица прав доступа: роль -> список разрешенных прав
 ROLE_PERMISSIONS = {
     UserRole.GUEST: [
@@ -76,43 +113,11 @@ ROLE_PERMISSIONS = {
         Permission.LOGIN,
     ],
     
-    UserRole.USER: [
-        # Аутентификация
-        Permission.LOGIN,
-        Permission.LOGOUT,
-        
-        # Управление профилем
-        Permission.VIEW_OWN_PROFILE,
-        Permission.EDIT_OWN_PROFILE,
-        
-        # Аудитории
-        Permission.VIEW_ROOMS,
-        
-        # Бронирования
-        Permission.CREATE_BOOKINGS,
-        Permission.VIEW_OWN_BOOKINGS,
-        Permission.EDIT_OWN_BOOKINGS,
-        Permission.CANCEL_OWN_BOOKINGS,
-        
-        # Посещения
-        Permission.CHECK_IN,
-        Permission.CHECK_OUT,
-        Permission.VIEW_OWN_VISITS,
-        
-        # Пожертвования
-        Permission.CREATE_DONATIONS,
-        Permission.VIEW_OWN_DONATIONS,
-        
-        # Сообщество
-        Permission.VIEW_POSTS,
-        Permission.CREATE_POSTS,
-        Permission.EDIT_OWN_POSTS,
-        Permission.DELETE_OWN_POSTS,
-    ],
+    UserRole.USER: _USER_PERMISSIONS,
     
     UserRole.ADMIN: [
         # Все права пользователя
-        *ROLE_PERMISSIONS.get(UserRole.USER, []),
+        *_USER_PERMISSIONS,
         
         # Дополнительные права администратора
         Permission.VIEW_OTHER_PROFILES,
@@ -140,6 +145,18 @@ ROLE_PERMISSIONS = {
     ]
 }
 
+# Каждому праву соответствует свой бит, набору прав роли - одно число.
+# Маски ролей вычисляются один раз при импорте, проверка права - одно AND.
+PERMISSION_BITS = {permission: 1 << i for i, permission in enumerate(Permission)}
+
+def permissions_mask(permissions: Iterable[Permission]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+ROLE_MASKS = {role: permissions_mask(permissions) for role, permissions in ROLE_PERMISSIONS.items()}
+
 def get_user_role(user: Optional[User]) -> UserRole:
     """
     Определяет роль пользователя на основе его данных
@@ -156,35 +173,53 @@ def has_permission(user: Optional[User], permission: Permission) -> bool:
     """
     Проверяет, есть ли у пользователя указанное право
     """
-    user_role = get_user_role(user)
-    user_permissions = ROLE_PERMISSIONS.get(user_role, [])
-    return permission in user_permissions
+    return bool(ROLE_MASKS.get(get_user_role(user), 0) & PERMISSION_BITS[permission])
+
+def require(permission: Permission):
+    """
+    Зависимость FastAPI: возвращает текущего пользователя, если у него есть
+    право, иначе 403.
+
+        current_user: UserResponse = Depends(require(Permission.CREATE_ROOMS))
+    """
+    from .security import get_current_user
+    
+    bit = PERMISSION_BITS[permission]
+    
+    async def dependency(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
+        if not ROLE_MASKS.get(get_user_role(current_user), 0) & bit:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Permission '{permission.value}' required"
+            )
+        return current_user
+    
+    return dependency
 
 def require_permission(permission: Permission):
     """
-    Декоратор для проверки прав доступа к endpoint'у
+    Декоратор для проверки прав доступа к endpoint'у.
+    Сигнатура обработчика сохраняется (functools.wraps), но для новых
+    endpoint'ов удобнее зависимость Depends(require(...)).
     """
     def decorator(func):
-        def wrapper(*args, **kwargs):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
             # Ищем current_user в аргументах
-            current_user = None
-            for arg in args:
-                if isinstance(arg, User) or (hasattr(arg, 'is_admin')):
-                    current_user = arg
-                    break
-            
-            for key, value in kwargs.items():
-                if key == 'current_user' or (hasattr(value, 'is_admin')):
-                    current_user = value
-                    break
+            current_user = kwargs.get('current_user')
+            if current_user is None:
+                current_user = next((arg for arg in args if hasattr(arg, 'is_admin')), None)
             
             if not has_permission(current_user, permission):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Permission '{permission}' required"
+                    detail=f"Permission '{permission.value}' required"
                 )
             
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
         return wrapper
     return decorator
 
@@ -271,18 +306,24 @@ def is_owner_or_admin(user: Optional[User], resource_user_id: int) -> bool:
     return user.id == resource_user_id or is_admin(user)
 
 # Утилиты для валидации бизнес-правил
+MAX_ACTIVE_BOOKINGS = 3
+
+def remaining_booking_slots(user: User, db: Session) -> int:
+    """
+    Сколько еще активных бронирований может создать пользователь
+    """
+    from ..crud import count_user_bookings
+    from datetime import datetime
+    
+    # Прошедшие, еще не отмеченные как completed, не считаются
+    active = count_user_bookings(db, user.id, "confirmed", ending_after=datetime.utcnow())
+    return max(MAX_ACTIVE_BOOKINGS - active, 0)
+
 def validate_booking_limits(user: User, db: Session) -> bool:
     """
     Проверяет лимиты бронирований для пользователя
     """
-    from ..crud import get_user_bookings
-    
-    # Получаем активные бронирования пользователя
-    bookings = get_user_bookings(db, user.id)
-    active_bookings = [b for b in bookings if b.status == "confirmed"]
-    
-    # Максимум 3 активных бронирования
-    return len(active_bookings) < 3
+    return remaining_booking_slots(user, db) > 0
 
 def validate_booking_time(booking_data) -> bool:
     """
@@ -0,0 +1,152 @@
+"""
+Кэш аутентифицированных пользователей по JWT-токену.
+
+get_current_user берет пользователя отсюда вместо запроса к базе на каждый
+запрос. В кэше хранится снимок schemas.UserResponse, а не ORM-объект, чтобы
+его можно было безопасно отдавать из разных сессий и запросов.
+
+Запись живет не дольше PRINCIPAL_CACHE_TTL секунд и не дольше срока
+действия токена. При изменении строки пользователя (карма, сумма
+пожертвований, is_active, is_admin) записи этого пользователя удаляются
+после commit - см. события сессии ниже. Кэш у каждого процесса свой:
+изменения из другого процесса видны не позже чем через TTL.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from .write_queue import after_commit
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+
+class PrincipalCache:
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # token -> (момент истечения по time.monotonic(), пользователь)
+        self._entries: "OrderedDict[str, Tuple[float, schemas.UserResponse]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Растет при каждой инвалидации: снимок, прочитанный из базы до
+        # конкурентного изменения, не должен попасть в кэш после него
+        self.version = 0
+    
+    def get(self, token: str) -> Optional[schemas.UserResponse]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._discard(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, token: str, user: schemas.UserResponse, token_expires_at: Optional[float] = None,
+            version: Optional[int] = None):
+        """
+        token_expires_at - время истечения токена (Unix time, поле exp),
+        version - значение self.version до чтения пользователя из базы
+        """
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._discard(token)
+            self._entries[token] = (time.monotonic() + ttl, user)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+    
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(token)
+            self.invalidations += 1
+            self.version += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.version += 1
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+    
+    def _discard(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[1].id]
+
+principal_cache = PrincipalCache()
+
+# Инвалидация после commit: id измененных пользователей копятся в
+# session.info и сбрасываются из кэша только когда изменения видны в базе
+
+CHANGED_USERS_KEY = "principal_cache_changed_users"
+
+# Другие кэши пользователей (utils/read_cache.py) подписываются сюда,
+# чтобы сбрасываться по тем же изменениям
+user_changed_callbacks: List[Callable[[int], None]] = []
+
+def mark_user_changed(db: Session, user_id: int):
+    """Для изменений в обход ORM (например, UPDATE users SET karma = ...)"""
+    db.info.setdefault(CHANGED_USERS_KEY, set()).add(user_id)
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_users(session, flush_context, instances):
+    for instance in session.dirty:
+        if isinstance(instance, models.User) and session.is_modified(instance):
+            mark_user_changed(session, instance.id)
+    for instance in session.deleted:
+        if isinstance(instance, models.User):
+            mark_user_changed(session, instance.id)
+
+def _invalidate_users(user_ids):
+    for user_id in user_ids:
+        principal_cache.invalidate_user(user_id)
+        for callback in user_changed_callbacks:
+            callback(user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop(CHANGED_USERS_KEY, None)
+    if user_ids:
+        # В очереди записи commit сессии - только SAVEPOINT: сброс после commit группы
+        after_commit(_invalidate_users, user_ids)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop(CHANGED_USERS_KEY, None)
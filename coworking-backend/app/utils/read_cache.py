@@ -0,0 +1,251 @@
+"""
+Кэш чтения (read-through) для частых запросов async_crud: get_room,
+get_rooms, get_user, get_user_by_email.
+
+Хранятся снимки схем (RoomResponse, UserResponse) в JSON, а не ORM-объекты,
+поэтому хранилище может быть и в памяти процесса, и общим (Redis).
+Хранилище выбирается переменной CACHE_BACKEND:
+- memory (по умолчанию) - LRU в памяти процесса, CACHE_SIZE записей;
+- redis - сервер по протоколу Redis по адресу CACHE_URL (нужен пакет redis);
+  вместо клиента redis можно передать любой объект с методами
+  get/set(ex=)/delete/incr, например заглушку в памяти;
+- none - кэш выключен.
+
+Записи живут CACHE_TTL секунд. Изменения сбрасывают кэш после commit:
+аудитории - из crud.create_room/update_room/delete_room, пользователи - по
+тем же событиям, что и principal_cache (mark_user_changed). Список аудиторий
+не удаляется по ключам, а получает новое поколение (ключ rooms:generation).
+
+Обработчики с условными GET (utils/conditional.py) передают версию ресурса
+из базы, и она входит в ключ: тело с ETag версии N строится только из
+записи, закэшированной при версии N, даже если изменение сделал другой
+процесс или after_commit этого процесса еще не сбросил кэш.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+from .. import schemas
+from .principal_cache import user_changed_callbacks
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", 10000))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 300))
+
+class LRUBackend:
+    """LRU с TTL в памяти процесса"""
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Счетчики (поколения) хранятся отдельно и не вытесняются
+        self._counters: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key])
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for key in self._counters:
+                self._counters[key] += 1
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+class RedisBackend:
+    """Хранилище по протоколу Redis; ключи с префиксом, чтобы не мешать другим данным"""
+
+    def __init__(self, client, prefix: str = "coworking:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def clear(self):
+        # Поколение списка аудиторий меняется, записи аудиторий и
+        # пользователей истекут по TTL
+        self.incr("rooms:generation")
+
+    def size(self) -> Optional[int]:
+        return None
+
+def create_backend(name: str = CACHE_BACKEND):
+    if name == "none":
+        return None
+    if name == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        return RedisBackend(redis.Redis.from_url(CACHE_URL))
+    return LRUBackend()
+
+ROOM = TypeAdapter(schemas.RoomResponse)
+ROOM_LIST = TypeAdapter(List[schemas.RoomResponse])
+USER = TypeAdapter(schemas.UserResponse)
+
+class ReadCache:
+    def __init__(self, backend=None, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Попадания и промахи по пространствам ключей (room, rooms, user)
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self.invalidations = 0
+        # Растет при каждой инвалидации: значение, прочитанное из базы до
+        # конкурентного изменения, не должно попасть в кэш после него
+        self.version = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get_or_load(self, namespace: str, key: str, adapter: TypeAdapter,
+                          load: Callable[[], Awaitable[Any]]):
+        """Значение из кэша или load(); None (не найдено) не кэшируется"""
+        if not self.enabled:
+            return await load()
+        cached = self.backend.get(key)
+        if cached is not None:
+            self._count(self._hits, namespace)
+            return adapter.validate_json(cached)
+        self._count(self._misses, namespace)
+        version = self.version
+        value = await load()
+        if value is None:
+            return None
+        snapshot = adapter.validate_python(value, from_attributes=True)
+        if version == self.version:
+            self.backend.set(key, adapter.dump_json(snapshot).decode(), self.ttl)
+        return snapshot
+
+    async def get_room(self, room_id: int, load, version: Optional[int] = None):
+        key = f"room:{room_id}" if version is None else f"room:{room_id}:v{version}"
+        return await self.get_or_load("room", key, ROOM, load)
+
+    async def get_rooms(self, skip: int, limit: int, active_only: bool, load, version: Optional[int] = None):
+        generation = self.backend.get("rooms:generation") if self.enabled else None
+        key = f"rooms:{generation or 0}:{int(active_only)}:{skip}:{limit}"
+        if version is not None:
+            key += f":v{version}"
+        return await self.get_or_load("rooms", key, ROOM_LIST, load)
+
+    async def get_user(self, user_id: int, load):
+        return await self.get_or_load("user", f"user:{user_id}", USER, load)
+
+    async def get_user_by_email(self, email: str, load_id, load_user):
+        """По email хранится только id, снимок пользователя - под user:{id}"""
+        if not self.enabled:
+            return await load_user()
+        user_id = self.backend.get(f"user_email:{email}")
+        if user_id is not None:
+            return await self.get_user(int(user_id), lambda: load_id(int(user_id)))
+        self._count(self._misses, "user")
+        version = self.version
+        user = await load_user()
+        if user is None:
+            return None
+        snapshot = USER.validate_python(user, from_attributes=True)
+        self.backend.set(f"user_email:{email}", str(snapshot.id), self.ttl)
+        if version == self.version:
+            self.backend.set(f"user:{snapshot.id}", USER.dump_json(snapshot).decode(), self.ttl)
+        return snapshot
+
+    def invalidate_room(self, room_id: Optional[int] = None):
+        if not self.enabled:
+            return
+        if room_id is not None:
+            self.backend.delete(f"room:{room_id}")
+        self.backend.incr("rooms:generation")
+        self.invalidations += 1
+        self.version += 1
+
+    def invalidate_user(self, user_id: int):
+        if not self.enabled:
+            return
+        self.backend.delete(f"user:{user_id}")
+        self.invalidations += 1
+        self.version += 1
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+            self.version += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = sorted(set(self._hits) | set(self._misses))
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            return {
+                "backend": type(self.backend).__name__ if self.enabled else None,
+                "size": self.backend.size() if self.enabled else 0,
+                "ttl_seconds": self.ttl,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "invalidations": self.invalidations,
+                "namespaces": {
+                    namespace: {
+                        "hits": self._hits.get(namespace, 0),
+                        "misses": self._misses.get(namespace, 0),
+                    }
+                    for namespace in namespaces
+                },
+            }
+
+    def _count(self, counter: Dict[str, int], namespace: str):
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + 1
+
+read_cache = ReadCache(create_backend())
+user_changed_callbacks.append(read_cache.invalidate_user)
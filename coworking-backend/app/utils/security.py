@@ -1,17 +1,17 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..database import get_db
-from .. import crud
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_read_db
+from .. import async_crud, schemas
+from .principal_cache import principal_cache
+from .password_hashing import pwd_context
 from dotenv import load_dotenv
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
@@ -34,7 +34,13 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
+    """Пользователь по токену; повторные запросы с тем же токеном обслуживаются из principal_cache"""
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    version = principal_cache.version
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,7 +54,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = crud.get_user_by_email(db, email=email)
+    user = await async_crud.get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    
+    principal = schemas.UserResponse.model_validate(user)
+    principal_cache.put(token, principal, payload.get("exp"), version)
+    return principal
\ No newline at end of file
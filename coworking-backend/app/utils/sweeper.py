@@ -0,0 +1,108 @@
+"""
+Периодическая очистка в процессе сервера.
+
+Каждые SWEEPER_INTERVAL секунд (0 - выключено):
+- посещения, открытые дольше STALE_VISIT_HOURS часов, закрываются
+  (crud.close_stale_visits), иначе забытый check-out навсегда оставляет
+  пользователя в коворкинге;
+- подтвержденные бронирования, которые уже закончились, получают статус
+  completed (crud.complete_past_bookings).
+
+Обновления идут пакетами по SWEEPER_BATCH_SIZE строк, каждый пакет - один
+UPDATE и один commit, чтобы не держать блокировку записи SQLite долго. При
+включенной очереди записи каждый пакет - отдельная операция очереди: внутри
+одной операции commit пакетов был бы только RELEASE SAVEPOINT, и вся
+очистка шла бы одной транзакцией группы.
+Повторный запуск в другом процессе безопасен: UPDATE затрагивает только
+еще не обработанные строки.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .. import crud
+from ..database import SessionLocal
+from .write_queue import write_queue
+
+SWEEPER_INTERVAL = float(os.getenv("SWEEPER_INTERVAL", 300))
+STALE_VISIT_HOURS = float(os.getenv("STALE_VISIT_HOURS", 12))
+SWEEPER_BATCH_SIZE = int(os.getenv("SWEEPER_BATCH_SIZE", 500))
+
+class Sweeper:
+    def __init__(self, interval: float = SWEEPER_INTERVAL, stale_visit_hours: float = STALE_VISIT_HOURS,
+                 batch_size: int = SWEEPER_BATCH_SIZE):
+        self.interval = interval
+        self.stale_visit_hours = stale_visit_hours
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+
+    def run_once(self) -> dict:
+        """Один проход очистки (синхронно, в вызывающем потоке)"""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        stats = {"started_at": started_at, "visits_closed": 0, "bookings_completed": 0, "error": None}
+        db = SessionLocal()
+        try:
+            stats["visits_closed"] = self._write_batches(
+                db, crud.close_stale_visits_batch, started_at - timedelta(hours=self.stale_visit_hours)
+            )
+            stats["bookings_completed"] = self._write_batches(
+                db, crud.complete_past_bookings_batch, started_at
+            )
+        except Exception as e:
+            db.rollback()
+            stats["error"] = str(e)
+        finally:
+            db.close()
+        stats["duration_ms"] = (time.perf_counter() - started) * 1000
+        self.runs += 1
+        self.last_run = stats
+        return stats
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "interval_seconds": self.interval,
+            "stale_visit_hours": self.stale_visit_hours,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "last_run": self.last_run,
+        }
+
+    def _write_batches(self, db, func, *args) -> int:
+        """Повторяет пакет func, пока он не вернет меньше batch_size строк"""
+        total = 0
+        while True:
+            # При включенной очереди записи пишет только ее поток
+            if write_queue.running:
+                count = write_queue.call(func, *args, self.batch_size).result()
+            else:
+                count = func(db, *args, self.batch_size)
+            total += count
+            if count < self.batch_size:
+                return total
+
+    async def _loop(self):
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.interval)
+
+sweeper = Sweeper()
@@ -0,0 +1,186 @@
+"""
+Очередь записи: все изменяющие операции crud выполняет один поток.
+
+Включается переменной WRITE_QUEUE_ENABLED=1. SQLite допускает одного
+писателя, и без очереди каждый запрос борется за блокировку записи сам
+(busy_timeout, повторы, "database is locked"). С очередью поток-писатель
+забирает все накопившиеся операции (до WRITE_QUEUE_MAX_BATCH), выполняет
+их в одной транзакции и делает один commit на группу (group commit).
+
+Каждая операция получает свою сессию, присоединенную к общей транзакции
+(join_transaction_mode="create_savepoint"): db.commit() внутри crud
+фиксирует только SAVEPOINT, а ошибка одной операции откатывает только ее.
+Результат или исключение передается вызывающему через future после
+commit всей группы. Если не удался сам commit группы, ошибку получают все
+ее операции, а индексы в памяти перестраиваются из базы.
+
+Побочные эффекты commit (сброс кэшей, индексы и рейтинги в памяти,
+события бронирований) вызываются через after_commit: внутри группы
+они откладываются до настоящего COMMIT, иначе конкурентный читатель мог бы
+закэшировать еще не записанные строки под новой версией.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database import engine, SessionLocal
+
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "0") == "1"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", 64))
+
+# Отложенные побочные эффекты группы, которую выполняет поток-писатель
+_deferred = threading.local()
+
+def after_commit(func: Callable, *args):
+    """func(*args) сразу или, внутри группы очереди записи, после ее commit"""
+    pending = getattr(_deferred, "pending", None)
+    if pending is None:
+        func(*args)
+    else:
+        pending.append((func, args))
+
+class WriteQueue:
+    def __init__(self, max_batch: int = WRITE_QUEUE_MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.items = 0
+        self.failed_commits = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Дожидается записи уже поставленных в очередь операций"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def call(self, func: Callable, *args) -> Future:
+        """Ставит func(db, *args) в очередь; результат - в возвращаемом future"""
+        future = Future()
+        self._queue.put((func, args, future))
+        return future
+
+    async def submit(self, func: Callable, *args):
+        return await asyncio.wrap_future(self.call(func, *args))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch": self.items / self.batches if self.batches else 0.0,
+            "failed_commits": self.failed_commits,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            if batch:
+                self._commit_group(batch)
+
+    def _commit_group(self, batch):
+        results = []
+        _deferred.pending = []
+        try:
+            with engine.connect() as connection:
+                transaction = connection.begin()
+                if connection.dialect.name == "sqlite":
+                    # pysqlite начинает транзакцию лениво; без явного BEGIN
+                    # первый SAVEPOINT стал бы внешней транзакцией
+                    connection.exec_driver_sql("BEGIN IMMEDIATE")
+                for func, args, future in batch:
+                    results.append((future, *self._execute(connection, func, args)))
+                transaction.commit()
+        except Exception as exc:
+            _deferred.pending = None
+            self.failed_commits += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            self._resync()
+            return
+
+        pending, _deferred.pending = _deferred.pending, None
+        try:
+            for func, args in pending:
+                func(*args)
+        except Exception:
+            # Состояние в памяти могло остаться наполовину обновленным
+            self._resync()
+        self.batches += 1
+        self.items += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _execute(self, connection, func, args):
+        db = Session(
+            bind=connection, join_transaction_mode="create_savepoint",
+            autoflush=False, expire_on_commit=False
+        )
+        deferred = len(_deferred.pending)
+        try:
+            return func(db, *args), None
+        except Exception as exc:
+            db.rollback()
+            # Откаченная операция не должна менять кэши и индексы
+            del _deferred.pending[deferred:]
+            return None, exc
+        finally:
+            db.close()
+
+    def _resync(self):
+        # Кэши и индексы обновлены после commit операций (SAVEPOINT), но
+        # группа не записалась: перечитываем их из базы
+        from .booking_events import booking_events
+        from .booking_index import booking_index
+        from .leaderboard import leaderboards
+        from .occupancy import occupancy
+        from .principal_cache import principal_cache
+        from .read_cache import read_cache
+
+        principal_cache.clear()
+        read_cache.clear()
+        booking_events.resync()
+        db = SessionLocal()
+        try:
+            booking_index.load(db)
+            occupancy.load(db)
+            leaderboards.load(db)
+        finally:
+            db.close()
+
+write_queue = WriteQueue()
+
+async def run_write(db, func: Callable, *args):
+    """func(db, *args) через очередь записи, если она запущена, иначе в сессии db"""
+    if write_queue.running:
+        return await write_queue.submit(func, *args)
+    return await db.run_sync(func, *args)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест подписок на изменения занятости (GET /api/rooms/{id}/events):
+тысячи простаивающих подписчиков SSE на одном процессе uvicorn.
+
+Измеряется память сервера до и после подключения подписчиков, загрузка
+процессора сервера в простое (heartbeat), задержка
+обычного GET /availability при открытых подписках и время доставки
+событий booked/released всем подписчикам аудитории с момента отправки
+POST/DELETE.
+
+Сервер запускается отдельным процессом с временной базой (нужен uvicorn).
+
+    python benchmarks/booking_events.py --subscribers 2000 --bookings 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def server_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def server_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def seed(rooms: int):
+    from app import crud, schemas
+    from app.database import SessionLocal, run_migrations
+    from app.utils.security import create_access_token, get_password_hash
+
+    run_migrations()
+    db = SessionLocal()
+    crud.create_user(
+        db, schemas.UserCreate(email="bench@example.com", full_name="Bench", password="password"),
+        get_password_hash("password")
+    )
+    room_ids = [crud.create_room(db, schemas.RoomCreate(name=f"Bench room {i}", capacity=10)).id for i in range(rooms)]
+    db.close()
+    return create_access_token({"sub": "bench@example.com"}), room_ids
+
+async def delivered(received, key, expected: int, sent: float) -> float:
+    """Время от отправки запроса до получения события последним подписчиком"""
+    while len(received.get(key, ())) < expected:
+        if time.perf_counter() - sent > 30:
+            raise RuntimeError(f"{key} delivered to {len(received.get(key, ()))} of {expected} subscribers")
+        await asyncio.sleep(0.001)
+    return max(received[key]) - sent
+
+async def measure(base_url, server, token, room_ids, subscribers, bookings, idle_seconds):
+    import httpx
+
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    headers = {"Authorization": f"Bearer {token}"}
+    received = {}
+    connected = 0
+    all_connected = asyncio.Event()
+
+    limits = httpx.Limits(max_connections=subscribers + 10, max_keepalive_connections=10)
+    timeout = httpx.Timeout(60.0, read=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def subscribe(i):
+            nonlocal connected
+            room_id = room_ids[i % len(room_ids)]
+            async with client.stream("GET", f"/api/rooms/{room_id}/events", params={"date": day.date().isoformat()}) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("retry:"):
+                        connected += 1
+                        if connected == subscribers:
+                            all_connected.set()
+                    elif line.startswith("data:"):
+                        event = json.loads(line[5:])
+                        received.setdefault((event["type"], event["booking_id"]), []).append(time.perf_counter())
+
+        rss_before = server_rss_mb(server.pid)
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscribe(i)) for i in range(subscribers)]
+        await asyncio.wait_for(all_connected.wait(), 300)
+        connect_time = time.perf_counter() - started
+        await asyncio.sleep(1)
+        rss_after = server_rss_mb(server.pid)
+        # Нагрузка процессора сервера от простаивающих подписок (heartbeat)
+        cpu_started = server_cpu_seconds(server.pid)
+        await asyncio.sleep(idle_seconds)
+        idle_cpu = (server_cpu_seconds(server.pid) - cpu_started) / idle_seconds
+
+        # Обычные запросы при открытых подписках
+        latencies = []
+        for i in range(50):
+            request_started = time.perf_counter()
+            response = await client.get(
+                f"/api/rooms/{room_ids[i % len(room_ids)]}/availability", params={"date": day.isoformat()}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - request_started)
+
+        # Каждое бронирование и его отмена доходят до всех подписчиков своей аудитории
+        delivery = []
+        for i in range(bookings):
+            room_id = room_ids[i % len(room_ids)]
+            expected = len(range(i % len(room_ids), subscribers, len(room_ids)))
+            slot = day + timedelta(hours=i % 12)
+            sent = time.perf_counter()
+            response = await client.post("/api/bookings/", headers=headers, json={
+                "room_id": room_id,
+                "start_time": slot.isoformat(),
+                "end_time": (slot + timedelta(hours=1)).isoformat(),
+            })
+            response.raise_for_status()
+            booking_id = response.json()["id"]
+            delivery.append(await delivered(received, ("booked", booking_id), expected, sent))
+
+            sent = time.perf_counter()
+            response = await client.delete(f"/api/bookings/{booking_id}", headers=headers)
+            response.raise_for_status()
+            delivery.append(await delivered(received, ("released", booking_id), expected, sent))
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        "connect_time": connect_time,
+        "rss_before": rss_before,
+        "rss_after": rss_after,
+        "idle_cpu": idle_cpu,
+        "availability_p50_ms": statistics.median(latencies) * 1000,
+        "availability_p99_ms": latencies[-1] * 1000,
+        "delivery_p50_ms": statistics.median(delivery) * 1000,
+        "delivery_max_ms": max(delivery) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=20)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--idle", type=float, default=20, help="seconds to measure idle CPU")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/events_bench.db",
+        SWEEPER_INTERVAL="0",
+    )
+    token, room_ids = seed(args.rooms)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=ROOT, env=os.environ
+    )
+    try:
+        import httpx
+
+        base_url = f"http://127.0.0.1:{args.port}"
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/health").raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        result = asyncio.run(measure(base_url, server, token, room_ids, args.subscribers, args.bookings, args.idle))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.subscribers} idle subscribers on {args.rooms} rooms, {args.bookings} bookings + cancellations")
+    print(f"connected in {result['connect_time']:.2f}s, server RSS {result['rss_before']:.1f} -> "
+          f"{result['rss_after']:.1f} MB "
+          f"({(result['rss_after'] - result['rss_before']) * 1024 / args.subscribers:.1f} KB per subscriber)")
+    print(f"idle server CPU {result['idle_cpu'] * 100:.1f}%")
+    print(f"GET /availability p50={result['availability_p50_ms']:.1f}ms max={result['availability_p99_ms']:.1f}ms")
+    print(f"request -> event at every subscriber of the room "
+          f"p50={result['delivery_p50_ms']:.1f}ms max={result['delivery_max_ms']:.1f}ms")
+
+if __name__ == "__main__":
+    main()
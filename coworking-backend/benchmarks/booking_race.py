@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Нагрузочная проверка записи бронирований из нескольких процессов
+(как несколько воркеров uvicorn с общей SQLite базой).
+
+Все процессы пытаются забронировать одни и те же слоты. Сравниваются:
+- legacy: проверка конфликтов без блокировки, два commit (бронирование и карма)
+- atomic: crud.create_booking - одна транзакция под BEGIN IMMEDIATE
+
+    python benchmarks/booking_race.py --workers 8 --slots 40
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def legacy_create_booking(db, booking, user_id):
+    """Путь записи до единой транзакции: check-then-insert и отдельный commit кармы"""
+    from app import crud, models
+    
+    if crud.get_conflicting_booking(db, booking.room_id, booking.start_time, booking.end_time):
+        raise ValueError("Room is already booked for this time period")
+    db_booking = models.Booking(**booking.dict(), user_id=user_id)
+    db.add(db_booking)
+    db.commit()
+    db.refresh(db_booking)
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user.karma += 2
+    db.commit()
+    return db_booking
+
+def worker(mode, room_ids, slots, user_id, results):
+    from sqlalchemy.exc import OperationalError
+    from app import crud, schemas
+    from app.database import SessionLocal
+    
+    create = crud.create_booking if mode == "atomic" else legacy_create_booking
+    created = conflicts = errors = 0
+    for room_id in room_ids:
+        for start in slots:
+            booking = schemas.BookingCreate.model_construct(
+                room_id=room_id, start_time=start, end_time=start + timedelta(hours=1), purpose=mode
+            )
+            db = SessionLocal()
+            try:
+                create(db, booking, user_id)
+                created += 1
+            except ValueError:
+                conflicts += 1
+            except OperationalError:
+                errors += 1
+            finally:
+                db.close()
+    results.put((created, conflicts, errors))
+
+def double_bookings(room_ids):
+    from sqlalchemy import text
+    from app.database import engine
+    
+    with engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT COUNT(*) FROM bookings a JOIN bookings b ON a.room_id = b.room_id AND a.id < b.id "
+            "AND a.status = 'confirmed' AND b.status = 'confirmed' "
+            "AND a.start_time < b.end_time AND a.end_time > b.start_time "
+            f"WHERE a.room_id IN ({','.join(str(r) for r in room_ids)})"
+        )).scalar()
+
+def run(mode, room_ids, slots, user_id, workers):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(mode, room_ids, slots, user_id, results))
+        for _ in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = [sum(x) for x in zip(*(results.get() for _ in processes))]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    
+    created, conflicts, errors = totals
+    attempts = created + conflicts + errors
+    print(f"{mode:7} created={created:4} conflicts={conflicts:5} errors={errors:3} "
+          f"double_bookings={double_bookings(room_ids):4} "
+          f"time={elapsed:6.2f}s throughput={attempts / elapsed:7.1f} req/s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rooms", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=40)
+    args = parser.parse_args()
+    
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/booking_race.db"
+    from app import crud, models, schemas
+    from app.database import SessionLocal, run_migrations
+    
+    run_migrations()
+    db = SessionLocal()
+    user = models.User(email="race@example.com", hashed_password="-", full_name="Race", karma=0)
+    db.add(user)
+    rooms = {
+        mode: [models.Room(name=f"{mode}-{i}", capacity=10) for i in range(args.rooms)]
+        for mode in ("legacy", "atomic")
+    }
+    db.add_all([room for mode_rooms in rooms.values() for room in mode_rooms])
+    db.commit()
+    user_id = user.id
+    room_ids = {mode: [room.id for room in mode_rooms] for mode, mode_rooms in rooms.items()}
+    db.close()
+    
+    first = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    slots = [first + timedelta(days=i // 12, hours=i % 12) for i in range(args.slots)]
+    
+    print(f"{args.workers} workers x {args.rooms} rooms x {args.slots} slots, every worker books every slot")
+    for mode in ("legacy", "atomic"):
+        run(mode, room_ids[mode], slots, user_id, args.workers)
+
+if __name__ == "__main__":
+    main()
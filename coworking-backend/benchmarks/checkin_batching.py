@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность POST /visits/check-in при всплеске запросов:
+commit на каждый запрос против пакетной записи (CHECKIN_BATCH_ENABLED=1).
+
+Каждый режим запускается в отдельном процессе с временной базой.
+
+    python benchmarks/checkin_batching.py --checkins 500 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+async def measure(checkins, concurrency, users):
+    import httpx
+    from app import crud, schemas
+    from app.database import SessionLocal, run_migrations
+    from app.main import app
+    from app.utils.checkin_batcher import checkin_batcher
+    from app.utils.security import create_access_token, get_password_hash
+    
+    run_migrations()
+    db = SessionLocal()
+    hashed_password = get_password_hash("password")
+    tokens = []
+    for i in range(users):
+        user = crud.create_user(
+            db, schemas.UserCreate(email=f"bench{i}@example.com", full_name=f"Bench {i}", password="password"),
+            hashed_password
+        )
+        tokens.append((user.id, create_access_token({"sub": user.email})))
+    db.close()
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+        latencies = []
+        
+        async def check_in(i):
+            user_id, token = tokens[i % len(tokens)]
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/visits/check-in", json={"user_id": user_id},
+                        headers={"Authorization": f"Bearer {token}"}
+                    )
+                    statuses.append(response.status_code)
+                except Exception:
+                    # ASGITransport пробрасывает необработанные ошибки приложения
+                    # (например, "database is locked")
+                    statuses.append(None)
+                latencies.append(time.perf_counter() - started)
+        
+        # Прогрев кэша пользователей, чтобы мерить только запись
+        await asyncio.gather(*(
+            client.get("/users/me", headers={"Authorization": f"Bearer {token}"}) for _, token in tokens
+        ))
+        started = time.perf_counter()
+        await asyncio.gather(*(check_in(i) for i in range(checkins)))
+        elapsed = time.perf_counter() - started
+    
+    db = SessionLocal()
+    karma = sum(crud.get_user(db, user_id).karma for user_id, _ in tokens)
+    db.close()
+    ok = statuses.count(200)
+    latencies.sort()
+    return {
+        "ok": ok,
+        "failed": len(statuses) - ok,
+        "karma": karma,
+        "elapsed": elapsed,
+        "throughput": ok / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "batches": checkin_batcher.stats()["batches"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        result = asyncio.run(measure(args.checkins, args.concurrency, args.users))
+        print(f"{args.mode:8} ok={result['ok']:5} failed={result['failed']:4} karma={result['karma']:5} batches={result['batches']:4} "
+              f"time={result['elapsed']:6.2f}s throughput={result['throughput']:7.1f} req/s "
+              f"p50={result['p50_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms")
+        return
+    
+    print(f"{args.checkins} check-ins, concurrency {args.concurrency}, {args.users} users")
+    for mode, enabled in (("commit", "0"), ("batched", "1")):
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/checkin_bench.db",
+            CHECKIN_BATCH_ENABLED=enabled,
+        )
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--checkins", str(args.checkins),
+             "--concurrency", str(args.concurrency), "--users", str(args.users)],
+            env=env, check=True
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность /auth/login при конкурентной нагрузке и задержка
+легкого запроса (GET /) в это время.
+
+Сравниваются bcrypt в пуле потоков (PASSWORD_HASH_WORKERS=0) и в пуле
+процессов. Каждый режим запускается в отдельном процессе с временной базой.
+
+    python benchmarks/login_throughput.py --logins 64 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+async def measure(logins, concurrency):
+    import httpx
+    from app import crud, schemas
+    from app.database import SessionLocal, run_migrations
+    from app.main import app
+    from app.utils.password_hashing import password_hasher
+    
+    run_migrations()
+    db = SessionLocal()
+    crud.create_user(db, schemas.UserCreate(email="bench@example.com", full_name="Bench", password="password"))
+    db.close()
+    password_hasher.warm_up()
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+        
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    "/auth/login", data={"username": "bench@example.com", "password": "password"}
+                )
+                statuses.append(response.status_code)
+        
+        probe_latencies = []
+        done = asyncio.Event()
+        
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+        
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+    
+    password_hasher.shutdown()
+    ok = statuses.count(200)
+    return {
+        "ok": ok,
+        "rejected": statuses.count(503),
+        "elapsed": elapsed,
+        "throughput": ok / elapsed,
+        "probe_p50_ms": statistics.median(probe_latencies) * 1000,
+        "probe_max_ms": max(probe_latencies) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="размер пула процессов")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        result = asyncio.run(measure(args.logins, args.concurrency))
+        print(f"{args.mode:8} ok={result['ok']:4} rejected={result['rejected']:3} "
+              f"time={result['elapsed']:6.2f}s throughput={result['throughput']:6.1f} logins/s "
+              f"GET / p50={result['probe_p50_ms']:6.1f}ms max={result['probe_max_ms']:7.1f}ms")
+        return
+    
+    print(f"{args.logins} logins, concurrency {args.concurrency}, "
+          f"BCRYPT_ROUNDS={os.getenv('BCRYPT_ROUNDS', 12)}")
+    for mode, workers in (("threads", 0), ("process", args.workers)):
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/login_bench.db",
+            PASSWORD_HASH_WORKERS=str(workers),
+        )
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode,
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            env=env, check=True
+        )
+
+if __name__ == "__main__":
+    main()
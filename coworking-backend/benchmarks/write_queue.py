@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность изменяющих запросов (пожертвования и бронирования
+вперемешку): каждый запрос сам берет блокировку записи SQLite против
+одного потока-писателя с group commit (WRITE_QUEUE_ENABLED=1).
+
+Каждый режим запускается в отдельном процессе с временной базой.
+
+    python benchmarks/write_queue.py --requests 600 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+async def measure(requests, concurrency, users):
+    import httpx
+    from app import crud, schemas
+    from app.database import SessionLocal, run_migrations
+    from app.main import app, start_write_queue, stop_write_queue
+    from app.utils.security import create_access_token, get_password_hash
+    from app.utils.write_queue import write_queue
+    
+    run_migrations()
+    db = SessionLocal()
+    hashed_password = get_password_hash("password")
+    tokens = []
+    for i in range(users):
+        user = crud.create_user(
+            db, schemas.UserCreate(email=f"bench{i}@example.com", full_name=f"Bench {i}", password="password"),
+            hashed_password
+        )
+        tokens.append((user.id, create_access_token({"sub": user.email})))
+    rooms = [crud.create_room(db, schemas.RoomCreate(name=f"Bench room {i}", capacity=10)).id for i in range(20)]
+    db.close()
+    start_write_queue()
+    
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    
+    def request(i):
+        user_id, token = tokens[i % len(tokens)]
+        headers = {"Authorization": f"Bearer {token}"}
+        if i % 2:
+            return "/donations/", {"user_id": user_id, "amount": 100}, headers
+        # Разные аудитории и часы: часть бронирований конфликтует
+        slot = day + timedelta(days=i // 480, hours=(i // 40) % 12)
+        booking = {
+            "room_id": rooms[(i // 2) % len(rooms)],
+            "start_time": slot.isoformat(),
+            "end_time": (slot + timedelta(hours=1)).isoformat(),
+        }
+        return "/api/bookings/", booking, headers
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+        latencies = []
+        
+        async def send(i):
+            url, body, headers = request(i)
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=body, headers=headers)
+                    statuses.append(response.status_code)
+                except Exception:
+                    # ASGITransport пробрасывает необработанные ошибки приложения
+                    statuses.append(None)
+                latencies.append(time.perf_counter() - started)
+        
+        await asyncio.gather(*(
+            client.get("/users/me", headers={"Authorization": f"Bearer {token}"}) for _, token in tokens
+        ))
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    
+    stats = write_queue.stats()
+    stop_write_queue()
+    latencies.sort()
+    handled = sum(1 for status in statuses if status in (200, 400))
+    return {
+        "ok": statuses.count(200),
+        "rejected": statuses.count(400),
+        "failed": len(statuses) - handled,
+        "elapsed": elapsed,
+        "throughput": handled / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "average_batch": stats["average_batch"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        result = asyncio.run(measure(args.requests, args.concurrency, args.users))
+        print(f"{args.mode:8} ok={result['ok']:5} conflicts={result['rejected']:4} failed={result['failed']:4} "
+              f"batch={result['average_batch']:5.1f} time={result['elapsed']:6.2f}s "
+              f"throughput={result['throughput']:7.1f} req/s "
+              f"p50={result['p50_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms")
+        return
+    
+    print(f"{args.requests} writes, concurrency {args.concurrency}, {args.users} users")
+    for mode, enabled in (("direct", "0"), ("queue", "1")):
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/write_bench.db",
+            WRITE_QUEUE_ENABLED=enabled,
+            SWEEPER_INTERVAL="0",
+        )
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--users", str(args.users)],
+            env=env, check=True
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Скрипт для проверки, что списки бронирований строятся фиксированным
+числом запросов (без N+1 при обращении к booking.user и booking.room)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from app.database import SessionLocal, engine, run_migrations
+from app import crud, models, schemas
+from app.utils.pagination import PageParams
+
+BOOKINGS = 20
+
+def count_queries(func, *args):
+    """Выполняет функцию crud в новой сессии, строит ответы и считает запросы"""
+    statements = []
+    
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = func(db, *args)
+        if isinstance(result, tuple):
+            result, _ = result
+        for booking in result if isinstance(result, list) else [result]:
+            schemas.BookingResponse.from_booking(booking)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+        db.rollback()
+        db.close()
+    return len(statements)
+
+def create_sample_bookings(db):
+    """Бронирования разных пользователей в разных аудиториях (откатываются в конце)"""
+    suffix = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    users = [
+        models.User(email=f"query-count-{suffix}-{i}@example.com", hashed_password="-",
+                    full_name=f"Query Count {i}")
+        for i in range(BOOKINGS)
+    ]
+    rooms = [models.Room(name=f"Query Count {suffix} {i}", capacity=4) for i in range(BOOKINGS)]
+    db.add_all(users + rooms)
+    db.flush()
+    
+    start = datetime.utcnow() + timedelta(days=400)
+    db.add_all([
+        models.Booking(user_id=user.id, room_id=rooms[0].id if i % 2 else room.id,
+                       start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i, minutes=30))
+        for i, (user, room) in enumerate(zip(users, rooms))
+    ])
+    db.commit()
+    return users[0].id, rooms[0].id, [user.id for user in users], [room.id for room in rooms]
+
+def cleanup(db, user_ids, room_ids):
+    db.query(models.Booking).filter(models.Booking.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.User).filter(models.User.id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(models.Room).filter(models.Room.id.in_(room_ids)).delete(synchronize_session=False)
+    db.commit()
+
+def check_query_counts():
+    """Возвращает список вызовов, выполнивших больше одного запроса"""
+    run_migrations()
+    
+    db = SessionLocal()
+    user_id, room_id, user_ids, room_ids = create_sample_bookings(db)
+    booking_id = db.query(models.Booking.id).filter(models.Booking.user_id == user_id).scalar()
+    
+    checks = [
+        ("все бронирования", crud.get_bookings, (PageParams(limit=BOOKINGS),)),
+        ("бронирования пользователя", crud.get_user_bookings, (user_id,)),
+        ("бронирования аудитории", crud.get_room_bookings, (room_id,)),
+        ("одно бронирование", crud.get_booking, (booking_id,)),
+    ]
+    
+    failures = []
+    try:
+        for name, func, args in checks:
+            queries = count_queries(func, *args)
+            ok = queries == 1
+            print(f"{'OK  ' if ok else 'FAIL'} {name}: {queries} запрос(ов)")
+            if not ok:
+                failures.append(name)
+    finally:
+        cleanup(db, user_ids, room_ids)
+        db.close()
+    
+    return failures
+
+if __name__ == "__main__":
+    print("Проверка числа запросов...")
+    failures = check_query_counts()
+    if failures:
+        print(f"Лишние запросы: {', '.join(failures)}")
+        sys.exit(1)
+    print("Готово!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Скрипт для проверки, что горячие запросы crud используют составные индексы
+(EXPLAIN QUERY PLAN, только SQLite)
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from app.database import SessionLocal, engine, run_migrations
+from app import crud
+from app.utils.pagination import PageParams
+from app.utils.occupancy import occupancy
+
+def capture(db, func, *args, **kwargs):
+    """Выполняет функцию crud и возвращает выполненные ею SQL-запросы"""
+    statements = []
+    
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        func(db, *args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+def check_query_plans():
+    """Возвращает список запросов, не использующих ожидаемый индекс"""
+    run_migrations()
+    
+    now = datetime.utcnow()
+    checks = [
+        ("конфликт бронирования", "ix_bookings_room_status_time",
+         crud.get_conflicting_booking, (1, now, now + timedelta(hours=1))),
+        ("доступность аудитории", "ix_bookings_room_status_time",
+         crud.get_room_availability, (1, now)),
+        ("бронирования пользователя", "ix_bookings_user_start",
+         crud.get_user_bookings, (1,)),
+        ("посещения пользователя", "ix_visits_user_check_in",
+         crud.get_user_visits, (1,)),
+        ("пожертвования пользователя", "ix_donations_user_date",
+         crud.get_user_donations, (1,)),
+        ("лента пожертвований", "ix_donations_donation_date",
+         crud.get_donations, ()),
+        ("страница посещений", "ix_visits_check_in_id",
+         crud.get_visits, (PageParams(after=(now, 1)),)),
+        ("страница бронирований", "ix_bookings_start_id",
+         crud.get_bookings, (PageParams(after=(now, 1)),)),
+        ("открытые посещения", "ix_visits_open_user",
+         occupancy.load, ()),
+        ("закончившиеся бронирования", "ix_bookings_confirmed_end",
+         crud.complete_past_bookings, (now,)),
+    ]
+    
+    failures = []
+    db = SessionLocal()
+    try:
+        for name, index, func, args in checks:
+            for statement, parameters in capture(db, func, *args):
+                plan = db.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN " + statement, parameters
+                ).fetchall()
+                details = " | ".join(row[-1] for row in plan)
+                ok = index in details
+                print(f"{'OK  ' if ok else 'FAIL'} {name}: {details}")
+                if not ok:
+                    failures.append(name)
+    finally:
+        db.close()
+    
+    return failures
+
+if __name__ == "__main__":
+    if engine.dialect.name != "sqlite":
+        print("Проверка поддерживается только для SQLite")
+        sys.exit(0)
+    
+    print("Проверка планов запросов...")
+    failures = check_query_plans()
+    if failures:
+        print(f"Без индекса: {', '.join(failures)}")
+        sys.exit(1)
+    print("Готово!")
@@ -10,14 +10,14 @@ from datetime import datetime
 # Добавляем путь к приложению
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.database import SessionLocal, engine
+from app.database import SessionLocal, run_migrations
 from app import models, crud, schemas
 
 def init_rooms():
     """Создает тестовые аудитории в базе данных"""
     
-    # Создаем все таблицы
-    models.Base.metadata.create_all(bind=engine)
+    # Приводим схему к последней миграции
+    run_migrations()
     
     db = SessionLocal()
     
@@ -0,0 +1,101 @@
+"""initial schema
+
+Схема, которую раньше создавал Base.metadata.create_all. Уже существующие
+таблицы пропускаются, поэтому ревизия применяется и к старым базам.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _create_table(existing, name, *columns):
+    if name not in existing:
+        op.create_table(name, *columns)
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    
+    _create_table(
+        existing, "users",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("email", sa.String(), nullable=False, unique=True, index=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_admin", sa.Boolean()),
+        sa.Column("karma", sa.Integer()),
+        sa.Column("total_donated", sa.Float()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    _create_table(
+        existing, "visits",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("check_in", sa.DateTime()),
+        sa.Column("check_out", sa.DateTime(), nullable=True),
+        sa.Column("duration_minutes", sa.Integer()),
+    )
+    _create_table(
+        existing, "donations",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("donation_date", sa.DateTime()),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("is_anonymous", sa.Boolean()),
+    )
+    _create_table(
+        existing, "rooms",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.Column("equipment", sa.Text(), nullable=True),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    _create_table(
+        existing, "bookings",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("room_id", sa.Integer(), sa.ForeignKey("rooms.id")),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=False),
+        sa.Column("purpose", sa.String(), nullable=True),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    _create_table(
+        existing, "daily_stats",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("visits_count", sa.Integer(), nullable=False),
+        sa.Column("active_users", sa.Integer(), nullable=False),
+        sa.Column("timed_visits_count", sa.Integer(), nullable=False),
+        sa.Column("visit_minutes", sa.Integer(), nullable=False),
+        sa.Column("bookings_count", sa.Integer(), nullable=False),
+        sa.Column("donations_count", sa.Integer(), nullable=False),
+        sa.Column("donations_amount", sa.Float(), nullable=False),
+    )
+    _create_table(
+        existing, "user_daily_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("visits_count", sa.Integer(), nullable=False),
+        sa.Column("timed_visits_count", sa.Integer(), nullable=False),
+        sa.Column("visit_minutes", sa.Integer(), nullable=False),
+        sa.Column("bookings_count", sa.Integer(), nullable=False),
+        sa.Column("donations_count", sa.Integer(), nullable=False),
+        sa.Column("donations_amount", sa.Float(), nullable=False),
+    )
+
+def downgrade():
+    for name in ("user_daily_stats", "daily_stats", "bookings", "rooms", "donations", "visits", "users"):
+        op.drop_table(name)
@@ -0,0 +1,33 @@
+"""composite indexes for hot query paths
+
+- bookings (room_id, status, start_time, end_time): проверка конфликтов, доступность
+- bookings (user_id, start_time): бронирования пользователя, лимиты
+- visits (user_id, check_in): посещения и последний визит пользователя
+- donations (donation_date), (user_id, donation_date): ленты пожертвований
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_bookings_room_status_time", "bookings", ["room_id", "status", "start_time", "end_time"]),
+    ("ix_bookings_user_start", "bookings", ["user_id", "start_time"]),
+    ("ix_visits_user_check_in", "visits", ["user_id", "check_in"]),
+    ("ix_donations_donation_date", "donations", ["donation_date"]),
+    ("ix_donations_user_date", "donations", ["user_id", "donation_date"]),
+]
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,31 @@
+"""forbid overlapping confirmed bookings on PostgreSQL
+
+EXCLUDE USING gist по (room_id, tsrange(start_time, end_time)) для
+подтвержденных бронирований. На SQLite пересечения исключаются
+блокировкой BEGIN IMMEDIATE в crud.lock_room_bookings.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "ALTER TABLE bookings ADD CONSTRAINT ex_bookings_room_time "
+        "EXCLUDE USING gist (room_id WITH =, tsrange(start_time, end_time) WITH &&) "
+        "WHERE (status = 'confirmed')"
+    )
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT ex_bookings_room_time")
@@ -0,0 +1,28 @@
+"""indexes for keyset pagination of full lists
+
+- visits (check_in, id): /admin/visits/
+- bookings (start_time, id): /api/bookings/ для администратора
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_visits_check_in_id", "visits", ["check_in", "id"]),
+    ("ix_bookings_start_id", "bookings", ["start_time", "id"]),
+]
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
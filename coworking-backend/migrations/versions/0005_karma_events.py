@@ -0,0 +1,38 @@
+"""karma_events ledger
+
+Журнал изменений кармы. Текущая карма каждого пользователя переносится
+в журнал одной записью opening_balance, чтобы сверка (reconcile_karma.py)
+сходилась для уже существующих пользователей.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "karma_events",
+        sa.Column("id", sa.Integer(), primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("delta", sa.Integer(), nullable=False),
+        sa.Column("reason", sa.String(), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_karma_events_user_created", "karma_events", ["user_id", "created_at"])
+    op.execute(
+        "INSERT INTO karma_events (user_id, delta, reason, created_at) "
+        "SELECT id, karma, 'opening_balance', CURRENT_TIMESTAMP "
+        "FROM users WHERE karma IS NOT NULL AND karma != 0"
+    )
+
+def downgrade():
+    op.drop_index("ix_karma_events_user_created", table_name="karma_events")
+    op.drop_table("karma_events")
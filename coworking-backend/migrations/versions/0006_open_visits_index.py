@@ -0,0 +1,42 @@
+"""partial index on open visits
+
+- visits (user_id) WHERE check_out IS NULL, уникальный: загрузка
+  заполненности при старте, поиск открытого посещения пользователя без
+  просмотра всей истории посещений и запрет второго check-in без
+  check-out. Лишние открытые посещения (кроме последнего у каждого
+  пользователя) перед созданием индекса закрываются с длительностью 0
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        UPDATE visits SET check_out = check_in, duration_minutes = 0
+        WHERE check_out IS NULL AND EXISTS (
+            SELECT 1 FROM visits AS later
+            WHERE later.user_id = visits.user_id
+              AND later.check_out IS NULL
+              AND (later.check_in > visits.check_in
+                   OR (later.check_in = visits.check_in AND later.id > visits.id))
+        )
+        """
+    )
+    op.create_index(
+        "ix_visits_open_user", "visits", ["user_id"], unique=True,
+        sqlite_where=sa.text("check_out IS NULL"),
+        postgresql_where=sa.text("check_out IS NULL"),
+        if_not_exists=True
+    )
+
+def downgrade():
+    op.drop_index("ix_visits_open_user", table_name="visits")
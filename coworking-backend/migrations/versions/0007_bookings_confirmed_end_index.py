@@ -0,0 +1,29 @@
+"""partial index for marking past bookings completed
+
+- bookings (end_time) WHERE status = 'confirmed': поиск закончившихся
+  подтвержденных бронирований периодической очисткой (app/utils/sweeper.py).
+  Индекс частичный: составной (status, end_time) SQLite выбирал и для
+  проверки конфликтов бронирования вместо ix_bookings_room_status_time
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        "ix_bookings_confirmed_end", "bookings", ["end_time"],
+        sqlite_where=sa.text("status = 'confirmed'"),
+        postgresql_where=sa.text("status = 'confirmed'"),
+        if_not_exists=True
+    )
+
+def downgrade():
+    op.drop_index("ix_bookings_confirmed_end", table_name="bookings")
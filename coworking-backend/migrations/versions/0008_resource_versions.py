@@ -0,0 +1,28 @@
+"""resource_versions
+
+- resource_versions (name, version, updated_at): версия и время последнего
+  изменения ресурса (rooms, donations) для ETag / Last-Modified условных
+  GET (app/utils/conditional.py); строка создается при первом изменении
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "resource_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("resource_versions")
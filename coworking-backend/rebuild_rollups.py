@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Скрипт для пересчета агрегатов статистики (daily_stats, user_daily_stats)
+из посещений, бронирований и пожертвований
+"""
+
+import sys
+import os
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, run_migrations
+from app import models
+from app import analytics
+
+def rebuild_rollups():
+    """Заполняет таблицы агрегатов по уже существующим данным"""
+    
+    # Приводим схему к последней миграции
+    run_migrations()
+    
+    db = SessionLocal()
+    
+    try:
+        result = analytics.rebuild_rollups(db)
+        print(f"Пересчитано дней: {result['days']}, записей по пользователям: {result['user_days']}")
+    except Exception as e:
+        print(f"Ошибка при пересчете агрегатов: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("Пересчет агрегатов статистики...")
+    rebuild_rollups()
+    print("Готово!")
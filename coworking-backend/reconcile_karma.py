@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Скрипт для сверки кармы пользователей с журналом karma_events.
+Расхождения исправляются: users.karma приводится к сумме журнала.
+
+    python reconcile_karma.py            # сверить и исправить
+    python reconcile_karma.py --dry-run  # только показать расхождения
+"""
+
+import sys
+import os
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, run_migrations
+from app import crud
+
+def reconcile_karma(fix: bool = True):
+    """Сверяет users.karma с суммой karma_events"""
+    
+    # Приводим схему к последней миграции
+    run_migrations()
+    
+    db = SessionLocal()
+    
+    try:
+        result = crud.reconcile_karma(db, fix=fix)
+        for mismatch in result["mismatches"]:
+            print(f"  пользователь {mismatch['user_id']}: карма {mismatch['karma']}, по журналу {mismatch['ledger']}")
+        print(f"Проверено пользователей: {result['users']}, расхождений: {len(result['mismatches'])}, "
+              f"исправлено: {result['fixed']}")
+        return result
+    except Exception as e:
+        print(f"Ошибка при сверке кармы: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("Сверка кармы с журналом...")
+    reconcile_karma(fix="--dry-run" not in sys.argv)
+    print("Готово!")